@@ -1,9 +1,18 @@
 #IMPORT LIBRARIES AND DATASET
 
+import os
+import re
+import sys
+import time
+try:
+  import resource
+except ImportError:  #Not available on Windows
+  resource = None
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from math import sqrt
+from scipy import sparse
 
 #Importing Dataset
 
@@ -12,50 +21,68 @@ ratings_df.head()
 
 #Importing the movies dataset from where we have got the ratings
 
-movies_df = pd.read_csv('movies.csv')
-movies_df.head()
-
 #DATA PREPROCESSING
 
-"""In movies dataset we have year along with the title"""
-"""So first we will extract year from title and assign it to a new column"""
-
-movies_df['year'] = movies_df.title.str.extract('(\(\d\d\d\d\))', expand = True)
-movies_df.head()
-
-#Remove parantheses from year
-
-movies_df['year'] = movies_df.year.str.extract('(\d\d\d\d)', expand=True)
+"""In movies dataset we have year along with the title, e.g. "Toy Story (1995)" """
+"""One compiled regex splits it into title and year in a single pass (surrounding whitespace
+is dropped by the pattern itself), and genres become a list"""
+
+TITLE_YEAR = re.compile(r'^\s*(?P<title>.*?)\s*(?:\((?P<year>\d{4})\))?\s*$')
+
+def preprocess_movies(raw):
+  parts = raw['title'].str.extract(TITLE_YEAR)
+  return pd.DataFrame({'movieId': raw['movieId'].values,
+                       'title': parts['title'].values,
+                       'year': parts['year'].values,
+                       'genres': raw['genres'].str.split('|').values})
+
+"""The cleaned table is cached next to movies.csv in a columnar binary file (Parquet) named
+after the source's size and modification time, so later runs just read it back. Caches of
+older versions of the file are deleted when a new one is written"""
+
+def load_movies(path='movies.csv'):
+  stat = os.stat(path)
+  cache_path = f"{path}.{stat.st_size}-{stat.st_mtime_ns}.parquet"
+  try:
+    movies = pd.read_parquet(cache_path)
+    #Parquet hands list columns back as arrays; turn them into lists like a fresh parse
+    movies['genres'] = [list(g) if g is not None else g for g in movies['genres']]
+    return movies
+  except (OSError, ImportError, ValueError):
+    pass  # no (readable) cache for this version of the file yet, or no Parquet engine installed
+  movies = preprocess_movies(pd.read_csv(path))
+  folder, name = os.path.split(os.path.abspath(path))
+  stale = re.compile(re.escape(name) + r'\.\d+-\d+\.parquet')
+  try:
+    for old in os.listdir(folder):
+      if stale.fullmatch(old) and old != os.path.basename(cache_path):
+        os.remove(os.path.join(folder, old))
+    movies.to_parquet(cache_path, index=False)
+  except (OSError, ImportError):
+    pass
+  return movies
+
+movies_df = load_movies('movies.csv')
 movies_df.head()
 
-#Remove year from title
+#One Hot Encoding of Genres as a sparse matrix: one row per movie, one column per genre,
+#built in a single vectorized pass instead of a loop over every row
 
-movies_df['title'] = movies_df.title.str.replace('(\(\d\d\d\d\))', '')
-movies_df.head()
-
-#Remove all the whitespaces from title
-
-movies_df['title'] = movies_df['title'].apply(lambda x: x.strip())
-
-#Convert Genres into a list
-
-movies_df['genres'] = movies_df.genres.str.split('|')
-movies_df.head()
+genre_counts = movies_df['genres'].str.len().values
+genre_names, genre_codes = np.unique(np.concatenate(movies_df['genres'].values), return_inverse=True)
+GenreMatrix = sparse.csr_matrix(
+    (np.ones(len(genre_codes)), genre_codes, np.concatenate([[0], np.cumsum(genre_counts)])),
+    shape=(len(movies_df), len(genre_names)))
+GenreMatrix.sum_duplicates()
+GenreMatrix.data[:] = 1  # a genre listed twice still counts once
 
-#One Hot Encoding of Genres
+#Row position of every movieId in GenreMatrix
 
-movies_copy = movies_df.copy()
+movie_row = pd.Series(np.arange(len(movies_df)), index=movies_df['movieId'])
 
-for index, row in movies_df.iterrows():
-  for genre in row['genres']:
-    movies_copy.at[index, genre] = 1
+#Preview of the encoding for the first few movies
 
-movies_copy.head()
-
-#Filling NAN values with 0 
-
-movies_copy = movies_copy.fillna(0)
-movies_copy.head()
+pd.DataFrame(GenreMatrix[:5].toarray(), columns=genre_names, index=movies_df['title'][:5])
 
 #Now let's check ratings dataset
 
@@ -95,49 +122,153 @@ movies_input
 movies_input = movies_input.drop(['genres','year'], axis=1)
 movies_input
 
-#Now we will check for same movies given in input in original dataset
-
-movies_user = movies_copy[movies_copy['movieId'].isin(movies_input['movieId'].tolist())]
-movies_user
-
-#Reset index of this dataset 
-
-movies_user = movies_user.reset_index(drop=True)
-movies_user
-
-#Create a Genre Table out of this dataset
+#Sparse user x movie matrix of the input ratings (a single user here)
 
-UserGenreTable = movies_user.drop(['movieId','title','genres','year'], axis=1)
-UserGenreTable
+def ratings_matrix(user_ids, movie_ids, ratings, movie_row):
+  """Sparse users x movies matrix; rows follow the sorted unique user ids, which are returned too."""
+  users, user_pos = np.unique(user_ids, return_inverse=True)
+  return sparse.csr_matrix((np.asarray(ratings, dtype=np.float64), (user_pos, movie_row[movie_ids].values)),
+                           shape=(len(users), len(movie_row))), users
 
-#dot product to get weights
+UserRatings, _ = ratings_matrix(np.zeros(len(movies_input)), movies_input['movieId'], movies_input['rating'], movie_row)
 
-UserProfile = UserGenreTable.transpose().dot(movies_input['rating'])
-
-#User Profile for every genre
+#User Profile for every genre: the input ratings summed per genre, as one sparse product
 
+UserProfile = pd.Series((UserRatings @ GenreMatrix).toarray().ravel(), index=genre_names)
 UserProfile
 
-#Create a genre table for every movie in original datset
-
-GenreTable = movies_copy.set_index(movies_copy['movieId'])
-GenreTable
-
-GenreTable = GenreTable.drop(['movieId','title','genres','year'], axis=1)
-GenreTable.head()
+#Final Recommendation value for each movie: genre overlap weighted by the profile
 
-#Final Recommendation value for each movie
-
-Recommendation_df = ((GenreTable*UserProfile).sum(axis=1))/UserProfile.sum()
+Recommendation_df = pd.Series(GenreMatrix @ UserProfile.values / UserProfile.sum(), index=movies_df['movieId'])
 Recommendation_df.head()
 
-#Sort the values to get movies with high recommendation values
+#Pick the 20 movies with the highest recommendation values; argpartition avoids sorting every movie
+
+def top_n_rows(scores, n):
+  """Column positions of the n largest scores in each row of a 2-D array, best first."""
+  n = min(n, scores.shape[1])
+  top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+  order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+  return np.take_along_axis(top, order, axis=1)
 
-Recommendation_df = Recommendation_df.sort_values(ascending=False)
+best = top_n_rows(Recommendation_df.values[None, :], 20)[0]
+Recommendation_df = Recommendation_df.iloc[best]
 Recommendation_df.head()
 
 #Final recommendation table for movies
 
-RecommendationTable =  movies_df.loc[movies_df['movieId'].isin(Recommendation_df.head(20).keys())]
+RecommendationTable =  movies_df.iloc[best]
 RecommendationTable
 
+#RECOMMENDATIONS FOR MANY USERS AT ONCE
+
+"""Users in ratings.csv get a genre profile from their own ratings, all as one sparse product"""
+
+def recommend_for_users(user_ratings, genre_matrix, n=20, max_block_cells=1 << 24):
+  """
+  Top-n movie rows for every row of a sparse users x movies rating matrix. Profiles are
+  user_ratings @ genre_matrix (users x genres, small enough to keep dense); scores are
+  computed for as many users at a time as fit in max_block_cells, and movies a user has
+  already rated are skipped.
+  """
+  profiles = (user_ratings @ genre_matrix).toarray()
+  totals = profiles.sum(axis=1)
+  totals[totals == 0] = 1
+  n_users, n_movies = user_ratings.shape
+  chunk_size = max(1, max_block_cells // max(n_movies, 1))
+  top = np.zeros((n_users, min(n, n_movies)), dtype=np.int64)
+  for start in range(0, n_users, chunk_size):
+    stop = min(start + chunk_size, n_users)
+    scores = (genre_matrix @ profiles[start:stop].T).T / totals[start:stop, None]
+    seen = user_ratings[start:stop].tocoo()
+    scores[seen.row, seen.col] = -np.inf
+    top[start:stop] = top_n_rows(scores, n)
+  return top
+
+known = ratings_df[ratings_df['movieId'].isin(movie_row.index)]
+AllUserRatings, user_ids = ratings_matrix(known['userId'].values, known['movieId'].values,
+                                          known['rating'].values, movie_row)
+#Scoring is users x movies work, so take a batch of users (all of them works too, just slower)
+
+batch_users = 1000
+batch_recommendations = recommend_for_users(AllUserRatings[:batch_users], GenreMatrix)
+
+#Top 5 titles for the first few users
+
+titles = np.asarray(movies_df['title'], dtype=object)
+pd.DataFrame(titles[batch_recommendations[:5, :5]], index=user_ids[:5])
+
+#ITEM-ITEM COLLABORATIVE FILTERING
+
+"""Two movies are neighbours when the same users rate them alike: cosine similarity between
+the movies' columns of the user x movie matrix, after removing each user's mean rating"""
+
+def item_neighbours(user_ratings, k=20, max_block_cells=1 << 24):
+  """
+  Top-k most similar movies for every movie column of a sparse users x movies rating matrix.
+  Similarities stay sparse (only movies that share a rater get a score) and are computed for a
+  block of movies at a time, at most max_block_cells possible pairs per block, so memory stays
+  bounded however many ratings there are. Returns (indices, scores) arrays of shape movies x k,
+  padded with -1 / -inf where a movie has fewer than k neighbours.
+  """
+  ratings = sparse.csr_matrix(user_ratings, dtype=np.float64)
+  counts = np.diff(ratings.indptr)
+  means = np.asarray(ratings.sum(axis=1)).ravel() / np.maximum(counts, 1)
+  centred = ratings.copy()
+  centred.data -= np.repeat(means, counts)
+  centred.eliminate_zeros()
+  items = sparse.csr_matrix(centred.T)
+  norms = np.sqrt(np.asarray(items.multiply(items).sum(axis=1)).ravel())
+  items = sparse.csr_matrix(sparse.diags(1 / np.where(norms > 0, norms, 1)) @ items)
+  items_t = sparse.csr_matrix(items.T)
+
+  n_items = items.shape[0]
+  indices = np.full((n_items, k), -1, dtype=np.int32)
+  scores = np.full((n_items, k), -np.inf, dtype=np.float32)
+  rated = np.flatnonzero(norms > 0)
+  block = max(1, max_block_cells // max(n_items, 1))
+  for start in range(0, len(rated), block):
+    rows = rated[start:start + block]
+    sims = sparse.csr_matrix(items[rows] @ items_t)
+    # Every stored similarity as (block row, movie, score), minus each movie's match with itself
+    r = np.repeat(np.arange(len(rows)), np.diff(sims.indptr))
+    c, v = sims.indices, sims.data
+    other = c != rows[r]
+    r, c, v = r[other], c[other], v[other]
+    # Best first within each row, then keep the first k of every row
+    order = np.lexsort((-v, r))
+    r, c, v = r[order], c[order], v[order]
+    rank = np.arange(len(r)) - np.searchsorted(r, r)
+    top = rank < k
+    indices[rows[r[top]], rank[top]] = c[top]
+    scores[rows[r[top]], rank[top]] = v[top]
+  return indices, scores
+
+def peak_memory_mb():
+  # ru_maxrss is in kilobytes on Linux (bytes on macOS); None where resource is unavailable
+  if resource is None:
+    return None
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+build_start = time.perf_counter()
+NeighbourIdx, NeighbourScores = item_neighbours(AllUserRatings)
+build_seconds = time.perf_counter() - build_start
+peak = peak_memory_mb()
+print(f"Item neighbours for {AllUserRatings.shape[1]} movies from {AllUserRatings.nnz} ratings "
+      f"in {build_seconds:.1f}s; table {(NeighbourIdx.nbytes + NeighbourScores.nbytes) / 1e6:.1f} MB, "
+      f"peak memory {'unavailable' if peak is None else f'{peak:.0f} MB'}")
+
+#Users who liked X also liked: read straight from the precomputed neighbour list
+
+def users_who_liked(title, n=10):
+  matches = np.flatnonzero(titles == title)
+  if len(matches) == 0:
+    return pd.DataFrame(columns=['title', 'genres', 'similarity'])
+  row = matches[0]
+  neighbours = NeighbourIdx[row][NeighbourIdx[row] >= 0][:n]
+  return pd.DataFrame({'title': titles[neighbours],
+                       'genres': movies_df['genres'].values[neighbours],
+                       'similarity': NeighbourScores[row][:len(neighbours)]})
+
+users_who_liked('Jumanji')
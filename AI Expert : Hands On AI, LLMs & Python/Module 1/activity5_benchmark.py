@@ -0,0 +1,452 @@
+# activity5_benchmark.py
+#
+# Benchmarks for activity5_movieRecommender.py on synthetic catalogs far larger than
+# imdb_top_1000.csv. Synthetic rows reuse the real catalog's genre strings, rating and
+# polarity distributions and overview lengths, with words drawn from its vocabulary plus
+# a Zipf tail of made-up words so the vocabulary keeps growing with catalog size.
+#
+#   python activity5_benchmark.py pipeline --sizes 1000 10000 100000 1000000 --out bench.json
+#   python activity5_benchmark.py server --workers 1 2 4 --clients 8 --requests 2000
+#   python activity5_benchmark.py incremental --data imdb_top_1000.csv
+#   python activity5_benchmark.py incremental --sizes 10000 100000 --adds 100 --json
+#   python activity5_benchmark.py tfidf --sizes 200000 1000000 --workers 1 2 4 8
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import activity5_movieRecommender as rec
+
+# ---------------------------
+# Synthetic catalog generator
+# ---------------------------
+def synthetic_catalog(n, base_df, seed=0, made_up_share=0.1):
+    """
+    n synthetic movies in load_data()'s normalized layout, with Polarity/Sentiment columns
+    sampled from base_df (so no TextBlob pass is needed over millions of fake overviews).
+    """
+    rng = np.random.default_rng(seed)
+    overviews = base_df['Overview'].fillna('').astype(str).values
+    tokenized = [re.findall(r"[A-Za-z']+", o) for o in overviews]
+    vocab, counts = np.unique(np.concatenate([np.array(t, dtype=object) for t in tokenized if t]),
+                              return_counts=True)
+    lengths = rng.choice(np.array([max(len(t), 1) for t in tokenized]), size=n)
+
+    words = vocab[rng.choice(len(vocab), size=int(lengths.sum()), p=counts / counts.sum())]
+    made_up = rng.random(len(words)) < made_up_share
+    words[made_up] = ['x%d' % z for z in rng.zipf(1.3, size=int(made_up.sum())) % 1_000_000]
+    cuts = np.cumsum(lengths)[:-1]
+    synthetic_overviews = [' '.join(chunk) for chunk in np.split(words, cuts)]
+
+    pick = rng.integers(0, len(base_df), size=n)
+    raw = pd.DataFrame({
+        'Series_Title': [f"Synthetic Movie {i}" for i in range(n)],
+        'Genre': base_df['Genre'].astype(object).values[pick],
+        'Overview': synthetic_overviews,
+        'IMDB_Rating': base_df['IMDb_Rating'].values[rng.integers(0, len(base_df), size=n)],
+    })
+    df = rec._normalize_chunk(raw)
+    rec.add_sentiment_columns(df, base_df['Polarity'].values[rng.integers(0, len(base_df), size=n)])
+    return df
+
+def load_base(data_path):
+    base_df = rec.load_data(data_path)
+    rec.load_or_build_sentiment(base_df, data_path)
+    return base_df
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds) * 1e3
+    return {
+        'queries': len(ms),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'throughput_qps': float(len(ms) / (ms.sum() / 1e3)) if ms.sum() else None,
+    }
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+# ---------------------------
+# End-to-end pipeline
+# ---------------------------
+def write_source_csv(df, path):
+    # Back to the raw IMDb column names so load_data() parses it like the real file
+    pd.DataFrame({
+        'Series_Title': df['Title'].values,
+        'Genre': df['Genre'].astype(object).values,
+        'Overview': df['Overview'].values,
+        'IMDB_Rating': df['IMDb_Rating'].values,
+    }).to_csv(path, index=False)
+
+def time_queries(df, tfidf_matrix, queries, **indexes):
+    latencies = []
+    for q in queries:
+        _, seconds = timed(rec.recommend_movies, df, tfidf_matrix, **q, **indexes)
+        latencies.append(seconds)
+    return latency_summary(latencies)
+
+def bench_pipeline(base_df, sizes, queries=200, sentiment_max_rows=100_000, seed=0, workdir=None,
+                   neighbour_max_rows=20000):
+    """
+    For each catalog size: write a synthetic CSV, then time load_data(), vectorize_text(),
+    the TextBlob sentiment precompute (skipped above sentiment_max_rows, where the sampled
+    polarity is kept), index building and `queries` recommend_movies() calls for each of the
+    title flow, the mood-label flow and the mood-polarity flow. Queries get the same indexes
+    load_engine() serves (genre, title, range indexes, rating views and the neighbour table);
+    the O(N^2) neighbour table is only built up to neighbour_max_rows titles, and larger
+    sizes answer title queries on the exact path. Peak RSS is the process high-water mark,
+    so sizes should run smallest first.
+    """
+    rng = np.random.default_rng(seed)
+    genres = [g for g, _ in rec.GenreIndex(base_df['Genre']).top_genres(8)]
+    rec.vectorize_text(base_df.head(50))  # warm-up, so sklearn's import is not charged to the first size
+    rows = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            synthetic = synthetic_catalog(size, base_df, seed=seed)
+            path = os.path.join(tmp, f'synthetic_{size}.csv')
+            write_source_csv(synthetic, path)
+            row = {'titles': size, 'csv_mb': os.path.getsize(path) / 1e6}
+
+            df, row['load_data_s'] = timed(rec.load_data, path)
+            row['rss_after_load_mb'] = rec.peak_rss_mb()
+            (tfidf_matrix, _), row['vectorize_text_s'] = timed(rec.vectorize_text, df)
+            row['tfidf_nnz'] = int(tfidf_matrix.nnz)
+            row['rss_after_tfidf_mb'] = rec.peak_rss_mb()
+            if size <= sentiment_max_rows:
+                polarity, row['sentiment_s'] = timed(rec.compute_polarity, df['Overview'].values)
+            else:
+                polarity, row['sentiment_s'] = synthetic['Polarity'].values, None
+            rec.add_sentiment_columns(df, polarity)
+            row['rss_after_sentiment_mb'] = rec.peak_rss_mb()
+
+            start = time.perf_counter()
+            catalog = rec.Catalog.from_frame(df, rec.build_genre_index(df))
+            rec.build_range_indexes(catalog)
+            indexes = {'title_index': rec.build_title_index(df), 'rating_views': rec.build_rating_views(catalog)}
+            row['index_build_s'] = time.perf_counter() - start
+            row['neighbours_k'] = rec.NEIGHBOUR_K if size <= neighbour_max_rows else 0
+            row['neighbour_build_s'] = None
+            if row['neighbours_k']:
+                indexes['neighbours'], row['neighbour_build_s'] = timed(rec.build_neighbour_table, tfidf_matrix)
+
+            def random_filter():
+                return {'genre_choice': str(rng.choice(genres)) if rng.random() < 0.5 else None,
+                        'min_rating': float(rng.choice([0.0, 7.5, 8.0]))}
+            seeds = rng.integers(0, size, size=queries)
+            title_queries = [dict(title_based=df['Title'].iat[i], **random_filter()) for i in seeds]
+            mood_queries = [dict(mood_label=str(rng.choice(['Positive', 'Neutral', 'Negative'])),
+                                 **random_filter()) for _ in range(queries)]
+            polarity_queries = [dict(mood_polarity=float(rng.uniform(-1, 1)), **random_filter())
+                                for _ in range(queries)]
+            row['title_flow'] = time_queries(catalog, tfidf_matrix, title_queries, **indexes)
+            row['mood_flow'] = time_queries(catalog, tfidf_matrix, mood_queries, **indexes)
+            row['polarity_flow'] = time_queries(catalog, tfidf_matrix, polarity_queries, **indexes)
+            row['peak_rss_mb'] = rec.peak_rss_mb()
+            rows.append(row)
+            os.remove(path)
+            del df, tfidf_matrix, catalog, synthetic
+            print(f"... {size} titles done", file=sys.stderr)
+    return rows
+
+def print_pipeline(rows):
+    print(f"{'titles':>9}{'load s':>9}{'tfidf s':>9}{'senti s':>9}{'k':>4}"
+          f"{'title p50/p99 ms':>19}{'mood p50/p99 ms':>18}{'polarity p50/p99':>19}{'title qps':>11}{'peak MB':>9}")
+    for r in rows:
+        senti = f"{r['sentiment_s']:>9.2f}" if r['sentiment_s'] is not None else f"{'-':>9}"
+        t, m, p = r['title_flow'], r['mood_flow'], r['polarity_flow']
+        print(f"{r['titles']:>9}{r['load_data_s']:>9.2f}{r['vectorize_text_s']:>9.2f}{senti}{r['neighbours_k']:>4}"
+              f"{t['p50_ms']:>10.2f}/{t['p99_ms']:<8.2f}{m['p50_ms']:>9.2f}/{m['p99_ms']:<8.2f}"
+              f"{p['p50_ms']:>10.2f}/{p['p99_ms']:<8.2f}{t['throughput_qps']:>11.0f}{r['peak_rss_mb'] or 0:>9.0f}")
+
+# ---------------------------
+# HTTP server load test
+# ---------------------------
+def pss_mb(pid):
+    # Proportional set size (shared pages split between the processes using them); Linux only
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) / 1e3
+    except OSError:
+        return None
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+def _run_client(args):
+    # One client process: send its queries one at a time, return per-request latencies
+    port, queries = args
+    latencies, errors = [], 0
+    for q in queries:
+        body = json.dumps(q)
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            conn.request('POST', '/recommend', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            errors += response.status != 200
+        except OSError:
+            errors += 1
+        finally:
+            conn.close()
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+def wait_for_server(port, proc, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+def bench_server(base_df, data_path, workers_list, clients=8, requests=2000, port=8765,
+                 cache_size=0, seed=0):
+    """
+    Start activity5_server.py once per worker count and drive it with `clients` concurrent
+    client processes sending `requests` mixed title/mood queries in total. The result cache is
+    off by default so throughput reflects query work rather than cache hits. Memory is the
+    summed PSS of the server processes, where shared pages are split between them.
+    """
+    rng = np.random.default_rng(seed)
+    titles = base_df['Title'].values
+    genres = [g for g, _ in rec.GenreIndex(base_df['Genre']).top_genres(8)]
+    queries = []
+    for _ in range(requests):
+        q = {'top_n': 5, 'min_rating': float(rng.choice([0.0, 7.5, 8.0]))}
+        if rng.random() < 0.5:
+            q['genre_choice'] = str(rng.choice(genres))
+        if rng.random() < 0.5:
+            q['title_based'] = str(titles[rng.integers(len(titles))])
+        else:
+            q['mood_label'] = str(rng.choice(['Positive', 'Neutral', 'Negative']))
+        queries.append(q)
+    shares = [(port, queries[i::clients]) for i in range(clients)]
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    rows = []
+    for workers in workers_list:
+        proc = subprocess.Popen([sys.executable, os.path.join(here, 'activity5_server.py'), '--data', data_path,
+                                 '--workers', str(workers), '--port', str(port), '--cache-size', str(cache_size)],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(port, proc)
+            with multiprocessing.Pool(clients) as pool:
+                pool.map(_run_client, [(port, q[:5]) for _, q in shares])  # warm-up
+                start = time.perf_counter()
+                results = pool.map(_run_client, shares)
+                wall = time.perf_counter() - start
+            pids = [proc.pid] + child_pids(proc.pid)
+            pss = [pss_mb(p) for p in pids]
+        finally:
+            proc.terminate()
+            proc.wait()
+        latencies = [t for lat, _ in results for t in lat]
+        row = {'workers': workers, 'clients': clients, 'wall_s': wall,
+               'errors': sum(e for _, e in results), **latency_summary(latencies)}
+        row['throughput_qps'] = len(latencies) / wall  # concurrent clients: requests / wall time
+        row['server_pss_mb'] = sum(pss) if None not in pss else None
+        rows.append(row)
+        print(f"... {workers} workers done", file=sys.stderr)
+    return rows
+
+def print_server(rows):
+    print(f"{'workers':>8}{'clients':>8}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'PSS MB':>9}")
+    for r in rows:
+        pss = f"{r['server_pss_mb']:>9.0f}" if r['server_pss_mb'] is not None else f"{'-':>9}"
+        print(f"{r['workers']:>8}{r['clients']:>8}{r['throughput_qps']:>10.0f}"
+              f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['errors']:>8}{pss}")
+
+# ---------------------------
+# Incremental updates vs full rebuild
+# ---------------------------
+def bench_incremental(base_df, sizes, adds=100, k=rec.NEIGHBOUR_K, neighbour_max_rows=20000, seed=0):
+    """
+    For each catalog size, compare one full TF-IDF refit against IncrementalIndex updates.
+    The exact neighbour table is O(N^2) to build, so it is only maintained for catalogs of up
+    to neighbour_max_rows titles; larger sizes measure the vector/IDF update alone.
+    """
+    # Warm-up, so one-time imports are not charged to the first size's refit or first add
+    rec.vectorize_text(base_df.head(50))
+    rec.IncrementalIndex(base_df.head(50), 1).add_titles(base_df.iloc[50:51][['Title', 'Genre', 'Overview', 'IMDb_Rating']])
+    rows = []
+    for size in sizes:
+        catalog = synthetic_catalog(size + adds, base_df, seed=seed)
+        base, extra = catalog.iloc[:size], catalog.iloc[size:]
+        _, full_seconds = timed(rec.vectorize_text, base)
+        use_k = k if size <= neighbour_max_rows else 0
+        index, build_seconds = timed(rec.IncrementalIndex, base, use_k)
+
+        add_times = []
+        for i in range(adds):
+            _, seconds = timed(index.add_titles, extra.iloc[i:i + 1][['Title', 'Genre', 'Overview', 'IMDb_Rating']])
+            add_times.append(seconds)
+        _, remove_seconds = timed(index.remove_titles, [size // 2])
+
+        row = {
+            'titles': size,
+            'neighbours_k': use_k,
+            'full_tfidf_refit_s': full_seconds,
+            'incremental_build_s': build_seconds,
+            'add_ms_per_title_median': statistics.median(add_times) * 1e3,
+            'add_ms_per_title_mean': statistics.mean(add_times) * 1e3,
+            'remove_ms_one_title': remove_seconds * 1e3,
+        }
+        row['speedup_vs_refit'] = full_seconds / (row['add_ms_per_title_mean'] / 1e3)
+        rows.append(row)
+        print(f"... {size} titles done", file=sys.stderr)
+    return rows
+
+def print_incremental(rows):
+    print(f"{'titles':>9}{'k':>4}{'refit s':>10}{'add ms/title':>14}{'remove ms':>11}{'speedup':>10}")
+    for r in rows:
+        print(f"{r['titles']:>9}{r['neighbours_k']:>4}{r['full_tfidf_refit_s']:>10.2f}"
+              f"{r['add_ms_per_title_mean']:>14.2f}{r['remove_ms_one_title']:>11.1f}"
+              f"{r['speedup_vs_refit']:>9.0f}x")
+
+# ---------------------------
+# Sharded TF-IDF build
+# ---------------------------
+def bench_tfidf(base_df, sizes, workers_list, seed=0):
+    """
+    For each catalog size, time vectorize_text() with each worker count (1 is the plain
+    single-process TfidfVectorizer) and check that the sharded matrix equals it.
+    """
+    rec.vectorize_text(base_df.head(50))  # warm-up, so sklearn's import is not charged to the first size
+    rows = []
+    for size in sizes:
+        catalog = synthetic_catalog(size, base_df, seed=seed)
+        reference = None
+        for workers in sorted(workers_list):
+            (matrix, _), seconds = timed(rec.vectorize_text, catalog, workers=workers, min_parallel_rows=0)
+            if reference is None:
+                reference, baseline = matrix, seconds
+            rows.append({
+                'titles': size,
+                'workers': workers,
+                'cpus': os.cpu_count(),
+                'seconds': seconds,
+                'speedup': baseline / seconds,
+                'max_abs_diff': float(abs(matrix - reference).max()) if matrix.nnz else 0.0,
+            })
+            print(f"... {size} titles, {workers} workers done", file=sys.stderr)
+        del catalog, reference
+    return rows
+
+def print_tfidf(rows):
+    print(f"{'titles':>9}{'workers':>8}{'cpus':>6}{'seconds':>9}{'speedup':>9}{'max diff':>10}")
+    for r in rows:
+        print(f"{r['titles']:>9}{r['workers']:>8}{r['cpus']:>6}{r['seconds']:>9.2f}"
+              f"{r['speedup']:>8.2f}x{r['max_abs_diff']:>10.1e}")
+
+# ---------------------------
+# Command line
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the movie recommender.")
+    parser.add_argument('--data', default='imdb_top_1000.csv',
+                        help="real catalog the synthetic distributions are drawn from (default: %(default)s)")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    parser.add_argument('--seed', type=int, default=0)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    inc = sub.add_parser('incremental', help="per-title update cost of IncrementalIndex vs a full TF-IDF refit")
+    inc.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    inc.add_argument('--adds', type=int, default=100, help="titles added one at a time per size")
+    inc.add_argument('--neighbour-max-rows', type=int, default=20000,
+                     help="largest catalog for which the exact neighbour table is maintained")
+    pipe = sub.add_parser('pipeline', help="load, TF-IDF, sentiment and query latency on synthetic catalogs")
+    pipe.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    pipe.add_argument('--queries', type=int, default=200, help="recommend_movies() calls per flow and size")
+    pipe.add_argument('--sentiment-max-rows', type=int, default=100_000,
+                      help="largest catalog TextBlob is run on; bigger ones keep the sampled polarity")
+    pipe.add_argument('--neighbour-max-rows', type=int, default=20000,
+                      help="largest catalog for which the neighbour table is built (larger ones use the exact path)")
+    pipe.add_argument('--out', help="also write the JSON report to this file")
+
+    srv = sub.add_parser('server', help="throughput of activity5_server.py as the worker count grows")
+    srv.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    srv.add_argument('--clients', type=int, default=8, help="concurrent client processes")
+    srv.add_argument('--requests', type=int, default=2000, help="requests per worker count")
+    srv.add_argument('--port', type=int, default=8765)
+    srv.add_argument('--cache-size', type=int, default=0, help="per-worker result cache (default off)")
+
+    tf = sub.add_parser('tfidf', help="sharded vectorize_text() speedup against the worker count")
+    tf.add_argument('--sizes', type=int, nargs='+', default=[200_000, 1_000_000])
+    tf.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args(argv)
+
+    rec.send_status_to_stderr()
+    base_df = load_base(args.data)
+    if args.command == 'pipeline':
+        rows = bench_pipeline(base_df, sorted(args.sizes), args.queries, args.sentiment_max_rows, args.seed,
+                              neighbour_max_rows=args.neighbour_max_rows)
+        report = {'benchmark': 'pipeline', 'environment': environment(), 'results': rows}
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(report, f, indent=2)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_pipeline(rows)
+    elif args.command == 'server':
+        rows = bench_server(base_df, args.data, args.workers, args.clients, args.requests, args.port,
+                            args.cache_size, args.seed)
+        if args.json:
+            print(json.dumps({'benchmark': 'server', 'environment': environment(), 'results': rows}, indent=2))
+        else:
+            print_server(rows)
+    elif args.command == 'tfidf':
+        rows = bench_tfidf(base_df, args.sizes, args.workers, args.seed)
+        if args.json:
+            print(json.dumps({'benchmark': 'tfidf', 'environment': environment(), 'results': rows}, indent=2))
+        else:
+            print_tfidf(rows)
+    elif args.command == 'incremental':
+        rows = bench_incremental(base_df, args.sizes, args.adds,
+                                 neighbour_max_rows=args.neighbour_max_rows, seed=args.seed)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            print_incremental(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# activity5_importtime.py
+#
+# Startup check for activity5_movieRecommender.py.
+# Runs `python -X importtime` on the recommender module in a fresh interpreter and reports
+# the total import time, the slowest imports and whether any heavy package (pandas, NumPy,
+# SciPy, scikit-learn, TextBlob) was pulled in at import time. Exits non-zero when the
+# budget is exceeded or a heavy package is imported eagerly, so regressions are visible.
+#
+#   python activity5_importtime.py
+#   python activity5_importtime.py --budget-ms 150 --top 15 --json
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODULE = 'activity5_movieRecommender'
+HEAVY_PACKAGES = ('pandas', 'numpy', 'scipy', 'sklearn', 'textblob', 'nltk', 'pyarrow')
+
+# ---------------------------
+# Measurement
+# ---------------------------
+def measure_imports(module=MODULE, runs=3):
+    """
+    Import `module` in `runs` fresh interpreters with -X importtime and keep the fastest run.
+    Returns a list of (module_name, self_us, cumulative_us) in import order.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=here, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+        rows = []
+        for line in proc.stderr.splitlines():
+            # "import time:       123 |        456 |   package.sub"
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        total = next((c for n, _, c in rows if n == module), 0)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    return best[1]
+
+def summarize(rows, module=MODULE, top=10):
+    total_us = next((c for n, _, c in rows if n == module), 0)
+    heavy = sorted({n.split('.')[0] for n, _, _ in rows if n.split('.')[0] in HEAVY_PACKAGES})
+    slowest = sorted(rows, key=lambda r: r[2], reverse=True)
+    slowest = [r for r in slowest if r[0] != module][:top]
+    return {
+        'module': module,
+        'total_ms': total_us / 1000,
+        'modules_imported': len(rows),
+        'heavy_packages_imported': heavy,
+        'slowest': [{'module': n, 'self_ms': s / 1000, 'cumulative_ms': c / 1000} for n, s, c in slowest],
+    }
+
+# ---------------------------
+# Report
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Measure import time of {MODULE}.")
+    parser.add_argument('--budget-ms', type=float, default=200.0,
+                        help="fail if the module takes longer than this to import (default: %(default)s)")
+    parser.add_argument('--top', type=int, default=10, help="how many of the slowest imports to list")
+    parser.add_argument('--runs', type=int, default=3, help="fresh interpreters to try; the fastest counts")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = summarize(measure_imports(runs=args.runs), top=args.top)
+    ok = summary['total_ms'] <= args.budget_ms and not summary['heavy_packages_imported']
+    summary['budget_ms'] = args.budget_ms
+    summary['ok'] = ok
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"import {MODULE}: {summary['total_ms']:.1f} ms "
+              f"({summary['modules_imported']} modules, budget {args.budget_ms:.0f} ms)")
+        print("heavy packages imported eagerly:", ", ".join(summary['heavy_packages_imported']) or "none")
+        print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+        for r in summary['slowest']:
+            print(f"{r['cumulative_ms']:>14.1f}{r['self_ms']:>10.1f}  {r['module']}")
+        print("\nOK" if ok else "\nREGRESSION: over budget or heavy imports at startup")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,21 @@
 # movie_recommender.py
 
-import random
 import time
 import sys
-import subprocess
 import re
-
-# Ensure TextBlob is available
-try:
-    from textblob import TextBlob
-except Exception:
-    print("TextBlob not found. Attempting to install...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "textblob"])
-    try:
-        from textblob import TextBlob
-    except Exception:
-        print("Warning: TextBlob installation failed. Sentiment will be limited.")
-        TextBlob = None
+import importlib
+import argparse
+import os
+import json
+import math
+import hashlib
+import shutil
+import bisect
+import difflib
+import unicodedata
+import contextlib
+import functools
+from collections import OrderedDict
 
 # Try colorama
 try:
@@ -27,69 +26,1026 @@ except Exception:
     Fore = _F()
     Style = _F()
 
-import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+# ---------------------------
+# Lazy heavy imports
+# ---------------------------
+# pandas, NumPy, SciPy, scikit-learn and TextBlob are imported by the stage that first needs
+# them, so `--help` and other light paths start instantly. Nothing is ever pip-installed here.
+class _LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name, package, purpose):
+        self._name = name
+        self._package = package
+        self._purpose = purpose
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                raise ImportError(f"{self._package} is required for {self._purpose} "
+                                  f"(install it with: pip install {self._package})") from e
+        return getattr(self._module, attr)
+
+pd = _LazyModule('pandas', 'pandas', 'loading the movie catalog')
+np = _LazyModule('numpy', 'numpy', 'the recommender')
+sparse = _LazyModule('scipy.sparse', 'scipy', 'the TF-IDF index')
+
+_TEXTBLOB = None
+
+def get_textblob():
+    """TextBlob class, or None when the optional textblob package is missing (sentiment is then neutral)."""
+    global _TEXTBLOB
+    if _TEXTBLOB is None:
+        try:
+            from textblob import TextBlob
+        except ImportError:
+            print(Fore.YELLOW + "Warning: TextBlob not installed (pip install textblob). "
+                                "Sentiment will be neutral.", file=sys.stderr)
+            TextBlob = False
+        _TEXTBLOB = TextBlob
+    return _TEXTBLOB or None
+
+DEFAULT_DATA_PATH = '/content/imdb_top_1000.csv'
+
+# Parameters of the TF-IDF vectorizer; part of the on-disk cache key
+TFIDF_PARAMS = {'stop_words': 'english', 'max_features': 5000}
+TFIDF_CACHE_VERSION = 1
+
+# Catalogs at least this large are tokenized in a process pool (when there is more than one core)
+TFIDF_PARALLEL_MIN_ROWS = 200_000
+
+# Number of stored nearest neighbours per title in the precomputed table
+NEIGHBOUR_K = 50
+
+# Default width of the dense LSA embedding used by --embedding mode
+EMBEDDING_DIMS = 128
+
+# Entries kept by the per-process query result cache (0 disables it)
+RESULT_CACHE_SIZE = 1024
+
+# IMDb ratings are 0-10; divided by this to blend with cosine similarity
+RATING_SCALE = 10.0
+
+# Weight of the disliked titles' mean against the liked titles' mean in multi-seed queries
+DISLIKE_WEIGHT = 0.5
+
+# Half-width of the polarity window around the user's mood score; doubled until enough titles match
+MOOD_POLARITY_WINDOW = 0.1
+
+# Catalogs at least this large get their sentiment computed in a process pool
+SENTIMENT_PARALLEL_MIN_ROWS = 5000
+
+# Where progress/status messages go; batch mode points this at stderr so stdout stays pure JSON lines
+STATUS_STREAM = sys.stdout
+
+def status(color, message):
+    print(color + message, file=STATUS_STREAM, flush=True)
+
+def send_status_to_stderr():
+    global STATUS_STREAM
+    STATUS_STREAM = sys.stderr
+
+# ---------------------------
+# Per-stage instrumentation
+# ---------------------------
+# Where profile records go as JSON lines; None (the default) turns instrumentation off
+PROFILE_SINK = None
+# Profile currently collecting stages and counters, if any
+_ACTIVE_PROFILE = None
+# Counter an outer profile keeps for each nested profile kind
+PROFILE_COUNTER_NAMES = {'query': 'queries', 'run': 'runs'}
+# Shared do-nothing context returned by stage()/profiled() while profiling is off
+_NO_PROFILE = contextlib.nullcontext()
+
+class Profile:
+    """Stage timings, peak RSS and counters of one run or one query."""
+
+    def __init__(self, kind, fields):
+        self.kind = kind
+        self.fields = fields
+        self.stages = {}
+        self.counters = {}
+        self.start = time.perf_counter()
+
+    def record(self):
+        return {'kind': self.kind, **self.fields,
+                'total_ms': (time.perf_counter() - self.start) * 1e3,
+                'peak_rss_mb': peak_rss_mb(), 'stages': self.stages, 'counters': self.counters}
+
+class _Stage:
+    __slots__ = ('profile', 'name', 'start', 'peak_before')
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.peak_before = peak_rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed_ms = (time.perf_counter() - self.start) * 1e3
+        peak = peak_rss_mb()
+        entry = self.profile.stages.setdefault(self.name, {'ms': 0.0, 'calls': 0, 'peak_rss_mb': None,
+                                                           'peak_rss_growth_mb': 0.0})
+        entry['ms'] += elapsed_ms
+        entry['calls'] += 1
+        if peak is not None:
+            # The peak is a process high-water mark: growth is how far this stage pushed it up
+            entry['peak_rss_mb'] = peak
+            entry['peak_rss_growth_mb'] += peak - self.peak_before
+        return False
+
+def stage(name):
+    """Context manager timing one pipeline stage of the active profile (a no-op when off)."""
+    if _ACTIVE_PROFILE is None:
+        return _NO_PROFILE
+    return _Stage(_ACTIVE_PROFILE, name)
+
+def count(name, n=1):
+    # Add n to a counter of the active profile, e.g. rows_scanned / rows_returned
+    if _ACTIVE_PROFILE is not None:
+        _ACTIVE_PROFILE.counters[name] = _ACTIVE_PROFILE.counters.get(name, 0) + int(n)
+
+@contextlib.contextmanager
+def _profiling(kind, fields):
+    global _ACTIVE_PROFILE
+    outer, _ACTIVE_PROFILE = _ACTIVE_PROFILE, Profile(kind, fields)
+    profile = _ACTIVE_PROFILE
+    try:
+        yield profile
+    finally:
+        _ACTIVE_PROFILE = outer
+        if outer is not None:
+            name = PROFILE_COUNTER_NAMES.get(kind, kind)
+            outer.counters[name] = outer.counters.get(name, 0) + 1
+        PROFILE_SINK.write(json.dumps(profile.record(), default=str) + '\n')
+        PROFILE_SINK.flush()
+
+def profiled(kind, **fields):
+    """
+    Collect a Profile for the enclosed block and write its record to PROFILE_SINK on exit.
+    Nested blocks (a query inside a run) get their own record; the outer one only counts them.
+    """
+    if PROFILE_SINK is None:
+        return _NO_PROFILE
+    return _profiling(kind, fields)
+
+def staged(name):
+    # Decorator form of stage() for the load-time builders
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            if _ACTIVE_PROFILE is None:
+                return fn(*args, **kwargs)
+            with _Stage(_ACTIVE_PROFILE, name):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
+
+def enable_profiling(stream):
+    """Write a JSON profile record per run and per query to `stream` (None turns it off)."""
+    global PROFILE_SINK
+    PROFILE_SINK = stream
 
 # ---------------------------
 # Load & preprocess
 # ---------------------------
-def load_data(file_path='/content/imdb_top_1000.csv'):
+# Only these source columns are read; everything else in the file is skipped
+CATALOG_COLUMNS = ['Series_Title', 'Genre', 'Overview', 'IMDB_Rating']
+# Ratings are read as text and coerced, so a stray "N/A" becomes 0.0 instead of failing the load
+CATALOG_DTYPES = {'Series_Title': str, 'Genre': 'category', 'Overview': str, 'IMDB_Rating': str}
+
+def peak_rss_mb():
+    # Peak resident set size of this process, or None where the resource module is unavailable
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3  # bytes on macOS, kB on Linux
+
+def catalog_format(file_path):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext in ('.feather', '.arrow'):
+        return 'feather'
+    return 'csv'
+
+def _source_columns(file_path, fmt):
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(file_path).names
+    if fmt == 'feather':
+        import pyarrow.ipc
+        return pyarrow.ipc.open_file(file_path).schema.names
+    return list(pd.read_csv(file_path, nrows=0).columns)
+
+def _normalize_chunk(raw):
+    """Rename, type and derive the internal columns for one chunk of source rows."""
+    df = pd.DataFrame({
+        'Title': raw['Series_Title'],
+        'Genre': raw['Genre'].astype('category'),
+        'Overview': raw['Overview'],
+        'IMDb_Rating': pd.to_numeric(raw['IMDB_Rating'], errors='coerce').fillna(0.0).astype(np.float32),
+    })
+    # Build combined features (Genre + Overview)
+    df['combined_features'] = (df['Genre'].astype(object).fillna('') + ' ' +
+                               df['Overview'].fillna('').astype(object))
+    return df
+
+def iter_catalog_chunks(file_path, chunksize=None):
     """
-    Load CSV and normalize columns to Title, Genre, Overview, IMDb_Rating, combined_features.
-    Expects Series_Title and IMDB_Rating in the CSV as provided.
+    Yield normalized catalog chunks (see _normalize_chunk) from CSV, Parquet or Feather,
+    reading only CATALOG_COLUMNS. With chunksize, the parser holds at most that many source
+    rows at once; load_data() still concatenates every chunk, so this bounds the parser's
+    working memory, not the size of the loaded catalog.
+    """
+    fmt = catalog_format(file_path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        if chunksize:
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize, columns=CATALOG_COLUMNS):
+                yield _normalize_chunk(batch.to_pandas())
+        else:
+            yield _normalize_chunk(pd.read_parquet(file_path, columns=CATALOG_COLUMNS))
+    elif fmt == 'feather':
+        # Read through a memory map, so only the selected columns' pages are touched
+        import pyarrow.feather
+        yield _normalize_chunk(pyarrow.feather.read_table(file_path, columns=CATALOG_COLUMNS,
+                                                          memory_map=True).to_pandas())
+    elif chunksize:
+        for raw in pd.read_csv(file_path, usecols=CATALOG_COLUMNS, dtype=CATALOG_DTYPES, chunksize=chunksize):
+            yield _normalize_chunk(raw)
+    else:
+        yield _normalize_chunk(pd.read_csv(file_path, usecols=CATALOG_COLUMNS, dtype=CATALOG_DTYPES))
+
+def _concat_chunks(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+    # Concatenating categoricals with different categories would silently fall back to object
+    genres = pd.api.types.union_categoricals([c['Genre'] for c in chunks])
+    df = pd.concat([c.drop(columns='Genre') for c in chunks], ignore_index=True)
+    df.insert(1, 'Genre', genres)
+    return df
+
+@staged('load_data')
+def load_data(file_path=DEFAULT_DATA_PATH, chunksize=None):
     """
+    Load a CSV/Parquet/Feather catalog and normalize columns to Title, Genre, Overview,
+    IMDb_Rating, combined_features. Expects Series_Title and IMDB_Rating in the file as provided.
+    Only the four needed columns are read (Genre as category, rating as float32).
+    """
+    fmt = catalog_format(file_path)
+    start = time.perf_counter()
     try:
-        df = pd.read_csv(file_path)
+        columns = _source_columns(file_path, fmt)
     except FileNotFoundError:
         print(Fore.RED + f"Error: File '{file_path}' not found. Put it in same folder or change the path.")
         sys.exit(1)
+    except ImportError:
+        if fmt == 'csv':
+            raise  # pandas itself is missing
+        print(Fore.RED + f"Error: reading {fmt} files needs pyarrow (pip install pyarrow).")
+        sys.exit(1)
 
     # Check required columns exist
-    expected = ['Series_Title', 'Genre', 'Overview', 'IMDB_Rating']
-    missing = [c for c in expected if c not in df.columns]
+    missing = [c for c in CATALOG_COLUMNS if c not in columns]
     if missing:
         print(Fore.RED + f"Error: Dataset is missing columns: {missing}")
-        print("Found columns:", ", ".join(df.columns))
+        print("Found columns:", ", ".join(columns))
         sys.exit(1)
 
-    # Rename for internal consistency
-    df = df.rename(columns={'Series_Title': 'Title', 'IMDB_Rating': 'IMDb_Rating'})
+    df = _concat_chunks(list(iter_catalog_chunks(file_path, chunksize)))
+    count('rows_loaded', len(df))
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    status(Fore.GREEN, f"Loaded {len(df)} movies ({fmt}) in {elapsed:.3f}s "
+                       f"({len(df) / max(elapsed, 1e-9):,.0f} rows/s"
+                       + (f", peak RSS {peak:.0f} MB)" if peak is not None else ")"))
+    return df
 
-    # Build combined features (Genre + Overview)
-    df['combined_features'] = df['Genre'].fillna('') + ' ' + df['Overview'].fillna('')
+# ---------------------------
+# Vectorize & sentiment helpers
+# ---------------------------
+@staged('vectorize_text')
+def vectorize_text(df, workers=None, min_parallel_rows=TFIDF_PARALLEL_MIN_ROWS):
+    """
+    Fit the TF-IDF vectorizer on combined_features. Large catalogs are sharded across a
+    process pool (see _vectorize_sharded); the result is the same matrix either way.
+    """
+    texts = df['combined_features'].values
+    workers = workers or os.cpu_count() or 1
+    if len(texts) >= min_parallel_rows and workers > 1:
+        return _vectorize_sharded(texts, workers)
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    tfidf = TfidfVectorizer(**TFIDF_PARAMS)
+    matrix = tfidf.fit_transform(texts)
+    return matrix, tfidf
+
+def _count_shard(texts):
+    # Runs inside worker processes: tokenize and count one shard with its own local vocabulary
+    from sklearn.feature_extraction.text import CountVectorizer
+    counter = CountVectorizer(**{k: v for k, v in TFIDF_PARAMS.items() if k != 'max_features'})
+    try:
+        counts = counter.fit_transform(texts)
+    except ValueError:  # every document in the shard is empty or stop words
+        return np.zeros(0, dtype=str), sparse.csr_matrix((len(texts), 0), dtype=np.int64)
+    terms = np.empty(len(counter.vocabulary_), dtype=object)
+    for term, i in counter.vocabulary_.items():
+        terms[i] = term
+    return terms.astype(str), sparse.csr_matrix(counts)
+
+def _vectorize_sharded(texts, workers):
+    """
+    TfidfVectorizer(**TFIDF_PARAMS).fit_transform() over a process pool. Each shard is
+    tokenized and counted independently; the parent merges the shard vocabularies, picks the
+    max_features most frequent terms exactly as scikit-learn does, sums document frequencies,
+    and re-indexes, weights and normalises the shards' sparse counts into one CSR matrix.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+    texts = [str(t) for t in texts]
+    chunk = -(-len(texts) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = list(pool.map(_count_shard, [texts[i:i + chunk] for i in range(0, len(texts), chunk)]))
+
+    # Global vocabulary in alphabetical order, as scikit-learn sorts it
+    vocab = np.unique(np.concatenate([terms for terms, _ in shards]))
+    to_global = [np.searchsorted(vocab, terms) for terms, _ in shards]
+    term_freq = np.zeros(len(vocab), dtype=np.int64)
+    doc_freq = np.zeros(len(vocab), dtype=np.int64)
+    for (_, counts), cols in zip(shards, to_global):
+        term_freq += np.bincount(cols[counts.indices], weights=counts.data, minlength=len(vocab)).astype(np.int64)
+        doc_freq += np.bincount(cols[counts.indices], minlength=len(vocab))
 
-    # Ensure rating numeric
-    df['IMDb_Rating'] = pd.to_numeric(df['IMDb_Rating'], errors='coerce').fillna(0.0)
+    keep = np.ones(len(vocab), dtype=bool)
+    limit = TFIDF_PARAMS.get('max_features')
+    if limit is not None and len(vocab) > limit:
+        keep[:] = False
+        keep[(-term_freq).argsort()[:limit]] = True
+    new_col = np.cumsum(keep) - 1
 
-    # Keep only useful columns
-    keep_cols = ['Title', 'Genre', 'Overview', 'IMDb_Rating', 'combined_features']
-    for c in keep_cols:
-        if c not in df.columns:
-            df[c] = ''
-    return df[keep_cols]
+    idf = np.log((1.0 + len(texts)) / (1.0 + doc_freq[keep].astype(np.float64))) + 1.0
+    blocks = []
+    for (_, counts), cols in zip(shards, to_global):
+        cols = cols[counts.indices]
+        kept = keep[cols]
+        row_of = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))[kept]
+        block = sparse.csr_matrix((counts.data[kept].astype(np.float64), (row_of, new_col[cols[kept]])),
+                                  shape=(counts.shape[0], int(keep.sum())))
+        block.data *= idf[block.indices]
+        blocks.append(block)
+    matrix = normalize(sparse.vstack(blocks, format='csr'), norm='l2', copy=False)
+
+    tfidf = TfidfVectorizer(**TFIDF_PARAMS)
+    tfidf.vocabulary_ = {term: int(i) for term, i in zip(vocab[keep], range(int(keep.sum())))}
+    tfidf.idf_ = idf
+    return matrix, tfidf
 
 # ---------------------------
-# Vectorize & sentiment helpers
+# On-disk TF-IDF cache
 # ---------------------------
-def vectorize_text(df):
-    tfidf = TfidfVectorizer(stop_words='english', max_features=5000)
-    matrix = tfidf.fit_transform(df['combined_features'].values)
+_FILE_HASHES = {}
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    # Memoized on (path, size, mtime) so several cache layers can share one hash pass
+    st = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+    if memo_key in _FILE_HASHES:
+        return _FILE_HASHES[memo_key]
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    _FILE_HASHES[memo_key] = h.hexdigest()
+    return _FILE_HASHES[memo_key]
+
+def tfidf_cache_key(file_path, params=TFIDF_PARAMS):
+    """
+    Cache key = hash of the CSV contents + vectorizer parameters + cache format version.
+    Any change to the source file or to TFIDF_PARAMS produces a new key.
+    """
+    h = hashlib.sha256()
+    h.update(file_sha256(file_path).encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    h.update(str(TFIDF_CACHE_VERSION).encode())
+    return h.hexdigest()
+
+def default_cache_dir(file_path):
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), '.recommender_cache')
+
+def tfidf_cache_entry(file_path, cache_dir=None):
+    """Return (key, entry_dir) of the cache entry for this CSV and TFIDF_PARAMS."""
+    cache_dir = cache_dir or default_cache_dir(file_path)
+    key = tfidf_cache_key(file_path)
+    return key, os.path.join(cache_dir, 'tfidf-' + key[:16])
+
+def save_tfidf_cache(entry_dir, key, matrix, tfidf, build_seconds, source=None):
+    """
+    Write the CSR arrays and IDF weights as separate .npy files (so they can be
+    memory mapped on load) plus a small JSON manifest holding the vocabulary and the
+    absolute path of the source file. The manifest is written last, so a half-written
+    entry is never treated as valid.
+    """
+    os.makedirs(entry_dir, exist_ok=True)
+    matrix = matrix.tocsr()
+    np.save(os.path.join(entry_dir, 'data.npy'), matrix.data)
+    np.save(os.path.join(entry_dir, 'indices.npy'), matrix.indices)
+    np.save(os.path.join(entry_dir, 'indptr.npy'), matrix.indptr)
+    np.save(os.path.join(entry_dir, 'idf.npy'), tfidf.idf_)
+    manifest = {
+        'key': key,
+        'version': TFIDF_CACHE_VERSION,
+        'source': source,
+        'params': TFIDF_PARAMS,
+        'shape': list(matrix.shape),
+        'vocabulary': {term: int(i) for term, i in tfidf.vocabulary_.items()},
+        'build_seconds': build_seconds,
+    }
+    tmp_path = os.path.join(entry_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(entry_dir, 'manifest.json'))
+
+class CachedVectorizer:
+    """
+    Fitted TfidfVectorizer restored from a cache entry. vocabulary_ and idf_ are plain
+    attributes; the scikit-learn object is only built (and scikit-learn imported) when some
+    other attribute, such as transform(), is first used, so a cache hit stays light.
+    """
+
+    def __init__(self, params, vocabulary, idf):
+        self.params = params
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self._vectorizer = None
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or attr == '_vectorizer':
+            raise AttributeError(attr)
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._vectorizer = TfidfVectorizer(**self.params)
+            self._vectorizer.vocabulary_ = self.vocabulary_
+            self._vectorizer.idf_ = self.idf_
+        return getattr(self._vectorizer, attr)
+
+def load_tfidf_cache(entry_dir, key):
+    """Return (matrix, vectorizer, manifest) from a valid cache entry, or None."""
+    manifest_path = os.path.join(entry_dir, 'manifest.json')
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('key') != key or manifest.get('version') != TFIDF_CACHE_VERSION:
+        return None
+    try:
+        data = np.load(os.path.join(entry_dir, 'data.npy'), mmap_mode='r')
+        indices = np.load(os.path.join(entry_dir, 'indices.npy'), mmap_mode='r')
+        indptr = np.load(os.path.join(entry_dir, 'indptr.npy'), mmap_mode='r')
+        idf = np.load(os.path.join(entry_dir, 'idf.npy'))
+    except (OSError, ValueError):
+        return None
+    matrix = sparse.csr_matrix((data, indices, indptr), shape=tuple(manifest['shape']), copy=False)
+    return matrix, CachedVectorizer(manifest['params'], manifest['vocabulary'], idf), manifest
+
+def prune_tfidf_cache(cache_dir, source, keep_dir):
+    """
+    Remove the cache entries (and the neighbour, sentiment, ANN and compact caches stored in
+    them) built from older versions of `source`. The cache directory is shared by every
+    catalog in the folder, so entries whose manifest names another file are left alone.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if not name.startswith('tfidf-') or entry_dir == keep_dir:
+            continue
+        try:
+            with open(os.path.join(entry_dir, 'manifest.json'), encoding='utf-8') as f:
+                owner = json.load(f).get('source')
+        except (OSError, ValueError, AttributeError):
+            continue
+        if owner == source:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+@staged('tfidf')
+def load_or_build_tfidf(df, file_path, cache_dir=None):
+    """
+    Return (tfidf_matrix, vectorizer), reusing the on-disk cache when the CSV and
+    vectorizer parameters are unchanged. Prints cold-vs-warm timings.
+    """
+    cache_dir = cache_dir or default_cache_dir(file_path)
+    key, entry_dir = tfidf_cache_entry(file_path, cache_dir)
+
+    start = time.perf_counter()
+    cached = load_tfidf_cache(entry_dir, key)
+    if cached is not None:
+        matrix, tfidf, manifest = cached
+        elapsed = time.perf_counter() - start
+        status(Fore.GREEN, f"TF-IDF cache hit: loaded in {elapsed:.3f}s "
+               f"(cold build took {manifest['build_seconds']:.3f}s)")
+        return matrix, tfidf
+
+    matrix, tfidf = vectorize_text(df)
+    build_seconds = time.perf_counter() - start
+    source = os.path.abspath(file_path)
+    try:
+        prune_tfidf_cache(cache_dir, source, entry_dir)
+        save_tfidf_cache(entry_dir, key, matrix, tfidf, build_seconds, source)
+    except OSError as e:
+        status(Fore.YELLOW, f"Warning: could not write TF-IDF cache ({e}).")
+    status(Fore.YELLOW, f"TF-IDF cache miss: built in {build_seconds:.3f}s")
     return matrix, tfidf
 
+# ---------------------------
+# Precomputed top-K neighbour table
+# ---------------------------
+def build_neighbour_table(tfidf_matrix, k=NEIGHBOUR_K, chunk_size=512, max_block_cells=1 << 25, rows=None):
+    """
+    For every row (or only the given `rows`), find its k most similar other rows.
+    Returns (indices int32 [len(rows), k], scores float32 [len(rows), k]), each row sorted by
+    score descending. TF-IDF rows are L2-normalised, so a sparse dot product is the cosine
+    similarity. Rows are processed in blocks so at most block x N similarities exist at once.
+    """
+    matrix = sparse.csr_matrix(tfidf_matrix)
+    n = matrix.shape[0]
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.int64)
+    k = max(0, min(k, n - 1))
+    nbr_idx = np.zeros((len(rows), k), dtype=np.int32)
+    nbr_scores = np.zeros((len(rows), k), dtype=np.float32)
+    if k == 0:
+        return nbr_idx, nbr_scores
+    block = max(1, min(chunk_size, max_block_cells // max(n, 1)))
+    matrix_t = matrix.T.tocsc()
+    for start in range(0, len(rows), block):
+        end = min(start + block, len(rows))
+        sims = (matrix[rows[start:end]] @ matrix_t).toarray()
+        local = np.arange(end - start)
+        sims[local, rows[start:end]] = -np.inf  # never list a title as its own neighbour
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = sims[local[:, None], top]
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        nbr_idx[start:end] = np.take_along_axis(top, order, axis=1)
+        nbr_scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+    return nbr_idx, nbr_scores
+
+@staged('neighbours')
+def load_or_build_neighbours(tfidf_matrix, file_path, k=NEIGHBOUR_K, cache_dir=None):
+    """
+    Return the (indices, scores) neighbour table, stored next to the TF-IDF cache entry
+    so it is invalidated together with it.
+    """
+    _, entry_dir = tfidf_cache_entry(file_path, cache_dir)
+    k = max(0, min(k, tfidf_matrix.shape[0] - 1))
+    idx_path = os.path.join(entry_dir, f'neighbours_k{k}_idx.npy')
+    score_path = os.path.join(entry_dir, f'neighbours_k{k}_scores.npy')
+    start = time.perf_counter()
+    try:
+        nbr_idx = np.load(idx_path, mmap_mode='r')
+        nbr_scores = np.load(score_path, mmap_mode='r')
+        if nbr_idx.shape == nbr_scores.shape == (tfidf_matrix.shape[0], k):
+            status(Fore.GREEN, f"Neighbour table cache hit: loaded in {time.perf_counter() - start:.3f}s")
+            return nbr_idx, nbr_scores
+    except (OSError, ValueError):
+        pass
+
+    nbr_idx, nbr_scores = build_neighbour_table(tfidf_matrix, k)
+    try:
+        os.makedirs(entry_dir, exist_ok=True)
+        np.save(score_path, nbr_scores)
+        np.save(idx_path, nbr_idx)
+    except OSError as e:
+        status(Fore.YELLOW, f"Warning: could not write neighbour table ({e}).")
+    status(Fore.YELLOW, f"Neighbour table (k={k}) built in {time.perf_counter() - start:.3f}s")
+    return nbr_idx, nbr_scores
+
+# ---------------------------
+# Dense LSA embeddings + approximate nearest neighbours
+# ---------------------------
+def _normalize_rows(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+def build_lsa_embeddings(tfidf_matrix, dims=EMBEDDING_DIMS, seed=0):
+    """
+    Reduce the TF-IDF matrix with truncated SVD to a float32 [N, dims] matrix with
+    L2-normalised rows, so a dot product between rows is their cosine similarity.
+    """
+    from sklearn.decomposition import TruncatedSVD
+    dims = max(1, min(dims, tfidf_matrix.shape[1] - 1, tfidf_matrix.shape[0] - 1))
+    svd = TruncatedSVD(n_components=dims, random_state=seed)
+    vectors = svd.fit_transform(tfidf_matrix).astype(np.float32)
+    return _normalize_rows(vectors)
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over unit vectors: spherical k-means splits the rows into
+    `nlist` cells, and a query only scores the rows of its `nprobe` closest cells.
+    Cell membership is stored CSR-style: rows of cell c are order[offsets[c]:offsets[c + 1]].
+    """
+
+    def __init__(self, vectors, centroids, order, offsets, nprobe=None):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe or max(1, len(centroids) // 8)
+
+    @classmethod
+    def build(cls, vectors, nlist=None, iterations=10, sample_size=50000, seed=0, block=65536):
+        n = len(vectors)
+        nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, min(n, max(sample_size, nlist)), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            # Reseed empty cells with random sample rows
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize_rows(sums)
+        assign = np.concatenate([np.argmax(vectors[i:i + block] @ centroids.T, axis=1)
+                                 for i in range(0, n, block)])
+        order = np.argsort(assign, kind='stable').astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        return cls(vectors, centroids.astype(np.float32), order, offsets)
+
+    def search(self, query, k, keep=None, exclude=None, nprobe=None):
+        """Approximate top-k rows for a query vector; returns (rows, scores) best first."""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        cell_scores = self.centroids @ query
+        cells = np.argpartition(-cell_scores, nprobe - 1)[:nprobe]
+        rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+        if keep is not None:
+            rows = rows[keep[rows]]
+        if exclude is not None:
+            rows = rows[rows != exclude]
+        if rows.size == 0:
+            return rows, np.zeros(0, dtype=np.float32)
+        scores = self.vectors[rows] @ query
+        k = min(k, rows.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return rows[top], scores[top]
+
+@staged('ann_index')
+def load_or_build_ann(tfidf_matrix, file_path, dims=EMBEDDING_DIMS, cache_dir=None):
+    """LSA vectors and IVF index, cached next to the TF-IDF entry."""
+    _, entry_dir = tfidf_cache_entry(file_path, cache_dir)
+    names = ('vectors', 'centroids', 'order', 'offsets')
+    paths = {name: os.path.join(entry_dir, f'lsa_d{dims}_{name}.npy') for name in names}
+    start = time.perf_counter()
+    try:
+        arrays = {name: np.load(path, mmap_mode='r') for name, path in paths.items()}
+        if arrays['vectors'].shape[0] == tfidf_matrix.shape[0]:
+            status(Fore.GREEN, f"LSA/ANN cache hit: loaded in {time.perf_counter() - start:.3f}s")
+            return IVFIndex(**arrays)
+    except (OSError, ValueError):
+        pass
+
+    vectors = build_lsa_embeddings(tfidf_matrix, dims)
+    index = IVFIndex.build(vectors)
+    try:
+        os.makedirs(entry_dir, exist_ok=True)
+        for name, path in paths.items():
+            np.save(path, getattr(index, name))
+    except OSError as e:
+        status(Fore.YELLOW, f"Warning: could not write LSA/ANN cache ({e}).")
+    status(Fore.YELLOW, f"LSA embedding (d={vectors.shape[1]}) + IVF index ({len(index.centroids)} cells) "
+                        f"built in {time.perf_counter() - start:.3f}s")
+    return index
+
+def ann_report(tfidf_matrix, ann_index, k=10, n_queries=200, nprobes=(1, 2, 4, 8, 16), seed=0):
+    """
+    Recall@k and mean per-query latency of the ANN path (and of brute force over the LSA
+    vectors) against the exact sparse TF-IDF cosine path. Returns a list of dict rows.
+    """
+    matrix = sparse.csr_matrix(tfidf_matrix)
+    n = matrix.shape[0]
+    rng = np.random.default_rng(seed)
+    seeds = rng.choice(n, min(n_queries, n), replace=False)
+
+    def exact(seed_idx):
+        sims = (matrix[seed_idx] @ matrix.T).toarray().ravel()
+        sims[seed_idx] = -np.inf
+        top = np.argpartition(-sims, k - 1)[:k]
+        return top[np.argsort(-sims[top])]
+
+    def lsa_brute(seed_idx):
+        sims = ann_index.vectors @ ann_index.vectors[seed_idx]
+        sims[seed_idx] = -np.inf
+        top = np.argpartition(-sims, k - 1)[:k]
+        return top[np.argsort(-sims[top])]
+
+    def timed(fn):
+        start = time.perf_counter()
+        out = [fn(int(s)) for s in seeds]
+        return out, (time.perf_counter() - start) / len(seeds)
+
+    truth, exact_latency = timed(exact)
+    rows = [{'method': 'exact tfidf', 'nprobe': None, 'recall': 1.0, 'latency_ms': exact_latency * 1e3}]
+
+    def add_row(method, nprobe, fn):
+        found, latency = timed(fn)
+        recall = np.mean([len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)])
+        rows.append({'method': method, 'nprobe': nprobe, 'recall': float(recall), 'latency_ms': latency * 1e3})
+
+    add_row('lsa brute force', None, lsa_brute)
+    for nprobe in nprobes:
+        if nprobe > len(ann_index.centroids):
+            break
+        add_row('lsa ivf', nprobe, lambda s, p=nprobe: ann_index.search(ann_index.vectors[s], k, exclude=s, nprobe=p)[0])
+    return rows
+
+def print_ann_report(rows, k=10):
+    print(f"{'method':<18}{'nprobe':>7}{f'recall@{k}':>11}{'ms/query':>10}")
+    for r in rows:
+        nprobe = '-' if r['nprobe'] is None else r['nprobe']
+        print(f"{r['method']:<18}{nprobe:>7}{r['recall']:>11.3f}{r['latency_ms']:>10.3f}")
+
+# ---------------------------
+# Compact quantized TF-IDF index
+# ---------------------------
+COMPACT_MAGIC = b'TFIDFCPT'
+COMPACT_VERSION = 1
+COMPACT_DTYPES = ('float32', 'uint8')
+
+def _prune_rows(matrix, top_m):
+    # Keep each row's top_m largest weights (ties broken by column order)
+    row_of = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((-matrix.data, row_of))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - matrix.indptr[row_of[order]]
+    keep = rank < top_m
+    pruned = sparse.csr_matrix((matrix.data[keep], matrix.indices[keep], np.concatenate([[0], np.cumsum(
+        np.bincount(row_of[keep], minlength=matrix.shape[0]))])), shape=matrix.shape)
+    from sklearn.preprocessing import normalize
+    return normalize(pruned, norm='l2', copy=False)
+
+class CompactIndex:
+    """
+    TF-IDF matrix stored as int32 column indices, int64 row pointers and either float32
+    weights or 8-bit codes with one float32 scale per row (weight = code * scale). Rows are
+    L2-normalised after optional top-M pruning, and the 8-bit scales are chosen so each
+    decoded row is again unit length, so dot products stay cosine similarities.
+    """
+
+    def __init__(self, shape, indptr, indices, data, scales=None, top_m=None):
+        self.shape = tuple(shape)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.scales = scales
+        self.top_m = top_m
+
+    @property
+    def dtype(self):
+        return self.data.dtype.name
+
+    @classmethod
+    def build(cls, tfidf_matrix, dtype='float32', top_m=None):
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(f"dtype must be one of {COMPACT_DTYPES}, not {dtype!r}")
+        matrix = sparse.csr_matrix(tfidf_matrix, dtype=np.float64, copy=True)
+        matrix.sort_indices()
+        if top_m:
+            matrix = _prune_rows(matrix, top_m)
+        if dtype == 'float32':
+            return cls(matrix.shape, matrix.indptr.astype(np.int64), matrix.indices.astype(np.int32),
+                       matrix.data.astype(np.float32), top_m=top_m)
+
+        # 8-bit: scale each row by its largest weight, drop weights that round to zero
+        row_of = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+        row_max = np.zeros(matrix.shape[0])
+        np.maximum.at(row_max, row_of, matrix.data)
+        row_max[row_max == 0] = 1.0
+        codes = np.rint(matrix.data / row_max[row_of] * 255).astype(np.uint8)
+        keep = codes > 0
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(row_of[keep], minlength=matrix.shape[0]))])
+        code_norms = np.sqrt(np.bincount(row_of[keep], weights=codes[keep].astype(np.float64) ** 2,
+                                         minlength=matrix.shape[0]))
+        code_norms[code_norms == 0] = 1.0
+        return cls(matrix.shape, indptr.astype(np.int64), matrix.indices[keep].astype(np.int32),
+                   codes[keep], (1.0 / code_norms).astype(np.float32), top_m=top_m)
+
+    def arrays(self):
+        arrays = {'indptr': self.indptr, 'indices': self.indices, 'data': self.data}
+        if self.scales is not None:
+            arrays['scales'] = self.scales
+        return arrays
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays().values())
+
+    def to_csr(self):
+        """
+        Float32 CSR view usable anywhere a TF-IDF matrix is. A float32 index is wrapped
+        zero-copy (memory-mapped arrays stay on disk); 8-bit codes are decoded into float32.
+        """
+        if self.scales is None:
+            data = self.data
+        else:
+            data = self.data.astype(np.float32)
+            data *= np.repeat(self.scales, np.diff(self.indptr))
+        return sparse.csr_matrix((data, self.indices, self.indptr), shape=self.shape, copy=False)
+
+    def save(self, path, align=64):
+        """
+        One file: magic, little-endian uint32 header length, JSON header (which records `align`),
+        then each array at an `align`-byte offset. Written to a temporary name and renamed into place.
+        """
+        layout, offset = {}, 0
+        for name, array in self.arrays().items():
+            layout[name] = [offset, array.dtype.str, list(array.shape)]
+            offset = -(-(offset + array.nbytes) // align) * align
+        header = json.dumps({'version': COMPACT_VERSION, 'shape': list(self.shape),
+                             'top_m': self.top_m, 'align': align, 'arrays': layout}).encode('utf-8')
+        start = -(-(len(COMPACT_MAGIC) + 4 + len(header)) // align) * align
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(COMPACT_MAGIC + len(header).to_bytes(4, 'little') + header)
+            for name, array in self.arrays().items():
+                f.seek(start + layout[name][0])
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a file written by save(); raises ValueError if it is not one."""
+        with open(path, 'rb') as f:
+            prefix = f.read(len(COMPACT_MAGIC) + 4)
+            if len(prefix) < len(COMPACT_MAGIC) + 4 or prefix[:len(COMPACT_MAGIC)] != COMPACT_MAGIC:
+                raise ValueError(f"{path} is not a compact TF-IDF index")
+            header_len = int.from_bytes(prefix[len(COMPACT_MAGIC):], 'little')
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        if header.get('version') != COMPACT_VERSION:
+            raise ValueError(f"{path}: unsupported compact index version {header.get('version')}")
+        # Files from before the header recorded it were written with the default alignment
+        align = header.get('align', 64)
+        if not isinstance(align, int) or align < 1:
+            raise ValueError(f"{path}: invalid alignment {align!r}")
+        start = -(-(len(COMPACT_MAGIC) + 4 + header_len) // align) * align
+        arrays = {}
+        for name, (offset, dtype, shape) in header['arrays'].items():
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=start + offset, shape=tuple(shape))
+        return cls(header['shape'], top_m=header['top_m'], **arrays)
+
+@staged('compact_index')
+def load_or_build_compact(tfidf_matrix, file_path, dtype='float32', top_m=None, cache_dir=None):
+    """CompactIndex for the cached TF-IDF matrix, stored as one file in its cache entry."""
+    _, entry_dir = tfidf_cache_entry(file_path, cache_dir)
+    path = os.path.join(entry_dir, f'compact_{dtype}_m{top_m or 0}.idx')
+    start = time.perf_counter()
+    try:
+        index = CompactIndex.load(path)
+        if index.shape == tfidf_matrix.shape:
+            status(Fore.GREEN, f"Compact index cache hit: loaded in {time.perf_counter() - start:.3f}s")
+            return index
+    except (OSError, ValueError):
+        pass
+
+    index = CompactIndex.build(tfidf_matrix, dtype, top_m)
+    try:
+        os.makedirs(entry_dir, exist_ok=True)
+        index.save(path)
+    except OSError as e:
+        status(Fore.YELLOW, f"Warning: could not write compact index ({e}).")
+    status(Fore.YELLOW, f"Compact index ({dtype}, top-M {top_m or 'all'}, {index.nbytes / 1e6:.1f} MB) "
+                        f"built in {time.perf_counter() - start:.3f}s")
+    return index
+
+def compact_report(tfidf_matrix, dtypes=COMPACT_DTYPES, top_ms=(None, 64, 32, 16), k=10, n_queries=200, seed=0):
+    """
+    Size and recall@k of each compact format against the full-precision matrix, using the
+    same seed-title queries as ann_report(). Sizes count the stored arrays only.
+    """
+    matrix = sparse.csr_matrix(tfidf_matrix)
+    n = matrix.shape[0]
+    k = max(1, min(k, n - 1))
+    rng = np.random.default_rng(seed)
+    seeds = rng.choice(n, min(n_queries, n), replace=False)
+
+    def top_k(m, seed_idx):
+        sims = (m[seed_idx] @ m.T).toarray().ravel()
+        sims[seed_idx] = -np.inf
+        return _top_k(sims, k)
+
+    truth = [set(top_k(matrix, int(s))) for s in seeds]
+    full_bytes = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    rows = [{'dtype': matrix.dtype.name, 'top_m': None, 'nnz': int(matrix.nnz), 'size_mb': full_bytes / 1e6,
+             'ratio': 1.0, 'recall': 1.0}]
+    for dtype in dtypes:
+        for top_m in top_ms:
+            index = CompactIndex.build(matrix, dtype, top_m)
+            compact = index.to_csr()
+            recall = np.mean([len(t & set(top_k(compact, int(s)))) / len(t) for t, s in zip(truth, seeds)])
+            rows.append({'dtype': dtype, 'top_m': top_m, 'nnz': int(len(index.data)), 'size_mb': index.nbytes / 1e6,
+                         'ratio': full_bytes / index.nbytes, 'recall': float(recall)})
+    return rows
+
+def print_compact_report(rows, k=10):
+    print(f"{'weights':<9}{'top-M':>6}{'nnz':>12}{'MB':>9}{'smaller':>9}{f'recall@{k}':>11}")
+    for r in rows:
+        top_m = '-' if r['top_m'] is None else r['top_m']
+        print(f"{r['dtype']:<9}{top_m:>6}{r['nnz']:>12}{r['size_mb']:>9.2f}{r['ratio']:>8.1f}x{r['recall']:>11.3f}")
+
+def sentiment_label(polarity):
+    if polarity > 0.25:
+        return 'Positive'
+    if polarity < -0.25:
+        return 'Negative'
+    return 'Neutral'
+
 def analyze_sentiment(text):
+    TextBlob = get_textblob()
     if TextBlob is None:
         return 0.0, 'Neutral'
     blob = TextBlob(str(text))
     polarity = blob.sentiment.polarity
-    if polarity > 0.25:
-        label = 'Positive'
-    elif polarity < -0.25:
-        label = 'Negative'
-    else:
-        label = 'Neutral'
-    return polarity, label
+    return polarity, sentiment_label(polarity)
+
+# ---------------------------
+# Catalog-level sentiment
+# ---------------------------
+def sentiment_labels(polarity):
+    # Vectorized sentiment_label() over an array of polarities
+    polarity = np.asarray(polarity)
+    return np.where(polarity > 0.25, 'Positive', np.where(polarity < -0.25, 'Negative', 'Neutral'))
+
+def _polarity_chunk(texts):
+    # Runs inside worker processes, so it must be a module-level function
+    return [analyze_sentiment(t)[0] for t in texts]
+
+@staged('sentiment_compute')
+def compute_polarity(texts, workers=None, min_parallel_rows=SENTIMENT_PARALLEL_MIN_ROWS):
+    """TextBlob polarity for every text, using a process pool for large catalogs."""
+    texts = [str(t) for t in texts]
+    if len(texts) < min_parallel_rows or (workers is not None and workers <= 1):
+        return np.array(_polarity_chunk(texts), dtype=np.float64)
+    workers = workers or os.cpu_count() or 1
+    chunk = -(-len(texts) // (workers * 4))
+    chunks = [texts[i:i + chunk] for i in range(0, len(texts), chunk)]
+    polarity = []
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_polarity_chunk, chunks):
+            polarity.extend(part)
+    return np.array(polarity, dtype=np.float64)
+
+def add_sentiment_columns(df, polarity):
+    df['Polarity'] = polarity
+    df['Sentiment'] = sentiment_labels(polarity)
+    return df
+
+@staged('sentiment')
+def load_or_build_sentiment(df, file_path, cache_dir=None, workers=None):
+    """
+    Add Polarity/Sentiment columns to df, persisted next to the TF-IDF cache entry
+    so TextBlob only ever runs once per catalog version.
+    """
+    _, entry_dir = tfidf_cache_entry(file_path, cache_dir)
+    path = os.path.join(entry_dir, 'polarity.npy')
+    start = time.perf_counter()
+    try:
+        polarity = np.load(path)
+        if polarity.shape == (len(df),):
+            status(Fore.GREEN, f"Sentiment cache hit: loaded in {time.perf_counter() - start:.3f}s")
+            return add_sentiment_columns(df, polarity)
+    except (OSError, ValueError):
+        pass
+
+    polarity = compute_polarity(df['Overview'].fillna('').values, workers)
+    # Without TextBlob every polarity is 0.0; don't persist that as if it were real
+    if get_textblob() is not None:
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            np.save(path, polarity)
+        except OSError as e:
+            status(Fore.YELLOW, f"Warning: could not write sentiment cache ({e}).")
+    status(Fore.YELLOW, f"Sentiment computed for {len(df)} movies in {time.perf_counter() - start:.3f}s")
+    return add_sentiment_columns(df, polarity)
+
+def ensure_sentiment(df):
+    # recommend_movies() never runs TextBlob per query; compute the columns once if a caller skipped it
+    if 'Polarity' not in df.columns or 'Sentiment' not in df.columns:
+        add_sentiment_columns(df, compute_polarity(df['Overview'].fillna('').values))
+    return df
 
 def processing_animation(message="Processing", duration=1.0, steps=5):
     print(Fore.CYAN + message, end='', flush=True)
@@ -99,113 +1055,1278 @@ def processing_animation(message="Processing", duration=1.0, steps=5):
     print()
 
 # ---------------------------
-# Genre listing helper
+# Title search index
 # ---------------------------
+def normalize_title(text):
+    # Lower-case, strip accents and collapse whitespace: "Amélie  " -> "amelie"
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TitleIndex:
+    """
+    Prebuilt lookup from a (possibly partial or misspelled) title to a positional row id.
+    Match tiers, in order: exact, prefix, substring, typo-tolerant. Within a tier the
+    earliest catalog row wins, preferring rows allowed by the optional `prefer` mask.
+    """
+
+    def __init__(self, titles, fuzzy_cutoff=0.75):
+        start = time.perf_counter()
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.keys = [normalize_title(t) for t in titles]
+        self.exact = {}
+        for row, key in enumerate(self.keys):
+            self.exact.setdefault(key, []).append(row)
+        self.sorted_keys = sorted((key, row) for row, key in enumerate(self.keys))
+        # Character trigram -> sorted int32 row ids; keys are padded so short titles still get grams
+        postings = {}
+        for row, key in enumerate(self.keys):
+            for gram in _trigrams(f'  {key} '):
+                postings.setdefault(gram, []).append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self.build_seconds = time.perf_counter() - start
+
+    def __len__(self):
+        return len(self.keys)
+
+    def memory_bytes(self):
+        # Approximate: key strings, posting arrays and the dict/list containers
+        total = sys.getsizeof(self.keys) + sum(sys.getsizeof(k) for k in self.keys)
+        total += sys.getsizeof(self.exact) + sys.getsizeof(self.sorted_keys)
+        total += sys.getsizeof(self.postings)
+        total += sum(sys.getsizeof(g) + a.nbytes for g, a in self.postings.items())
+        return total
+
+    def _pick(self, rows, prefer):
+        rows = sorted(rows)
+        if prefer is not None:
+            for row in rows:
+                if prefer[row]:
+                    return row
+        return rows[0] if rows else None
+
+    def _substring_rows(self, query):
+        if len(query) < 3:
+            return [row for row, key in enumerate(self.keys) if query in key]
+        grams = sorted(_trigrams(query), key=lambda g: len(self.postings.get(g, ())))
+        rows = self.postings.get(grams[0])
+        if rows is None:
+            return []
+        for gram in grams[1:]:
+            rows = np.intersect1d(rows, self.postings.get(gram, rows[:0]), assume_unique=True)
+            if rows.size == 0:
+                return []
+        return [int(row) for row in rows if query in self.keys[row]]
+
+    def _fuzzy_rows(self, query, shortlist=10):
+        grams = [self.postings[g] for g in _trigrams(f'  {query} ') if g in self.postings]
+        if not grams:
+            return []
+        rows, counts = np.unique(np.concatenate(grams), return_counts=True)
+        top = rows[np.argsort(-counts, kind='stable')[:shortlist]]
+        best, best_ratio = [], self.fuzzy_cutoff
+        for row in top:
+            ratio = difflib.SequenceMatcher(None, query, self.keys[row]).ratio()
+            if ratio > best_ratio:
+                best, best_ratio = [int(row)], ratio
+            elif ratio == best_ratio:
+                best.append(int(row))
+        return best
+
+    def lookup(self, query, prefer=None):
+        """Return the positional row id best matching `query`, or None."""
+        query = normalize_title(query)
+        if not query:
+            return None
+        if query in self.exact:
+            return self._pick(self.exact[query], prefer)
+        lo = bisect.bisect_left(self.sorted_keys, (query,))
+        prefix_rows = []
+        for key, row in self.sorted_keys[lo:]:
+            if not key.startswith(query):
+                break
+            prefix_rows.append(row)
+        if prefix_rows:
+            return self._pick(prefix_rows, prefer)
+        substring_rows = self._substring_rows(query)
+        if substring_rows:
+            return self._pick(substring_rows, prefer)
+        return self._pick(self._fuzzy_rows(query), prefer)
+
+@staged('title_index')
+def build_title_index(df):
+    index = TitleIndex(df['Title'].fillna('').values)
+    status(Fore.GREEN, f"Title index: {len(index)} titles, {len(index.postings)} trigrams, "
+           f"built in {index.build_seconds:.3f}s, ~{index.memory_bytes() / 1e6:.1f} MB")
+    return index
+
+# ---------------------------
+# Genre bitmask index
+# ---------------------------
+def split_genres(genre_string):
+    parts = (part.strip() for part in re.split(r',|\|', str(genre_string)))
+    return [part for part in parts if part]
+
+class GenreIndex:
+    """
+    Genres parsed once into a bitmask per row: bits[row, word] is a uint64 holding one bit
+    per genre of the vocabulary (word = genre_id // 64), so catalogs with hundreds of genres
+    still filter with a few NumPy bitwise ANDs. Each distinct Genre string is split only once.
+    """
+
+    def __init__(self, genre_series):
+        if isinstance(genre_series.dtype, pd.CategoricalDtype):
+            # Reuse the category codes; missing values (-1) map to an extra empty category
+            uniques = list(genre_series.cat.categories) + ['']
+            codes = genre_series.cat.codes.values.astype(np.int64)
+            codes[codes < 0] = len(uniques) - 1
+        else:
+            codes, uniques = pd.factorize(genre_series.fillna(''))
+        parsed = [split_genres(g) for g in uniques]
+        self.vocab = sorted({g for parts in parsed for g in parts})
+        self.ids = {g: i for i, g in enumerate(self.vocab)}
+        self.words = max(1, -(-len(self.vocab) // 64))
+        unique_bits = np.zeros((len(uniques), self.words), dtype=np.uint64)
+        for u, parts in enumerate(parsed):
+            unique_bits[u] = self.bits_for(parts)
+        self.bits = unique_bits[codes]
+        self.counts = self._count(codes, unique_bits)
+
+    def _count(self, codes, unique_bits):
+        # Rows per genre, computed from per-distinct-string frequencies
+        per_unique = np.bincount(codes, minlength=len(unique_bits))
+        counts = np.zeros(len(self.vocab), dtype=np.int64)
+        for gid in range(len(self.vocab)):
+            word, bit = divmod(gid, 64)
+            has = (unique_bits[:, word] >> np.uint64(bit)) & np.uint64(1)
+            counts[gid] = per_unique[has.astype(bool)].sum()
+        return counts
+
+    def bits_for(self, genres):
+        words = np.zeros(self.words, dtype=np.uint64)
+        for g in genres:
+            word, bit = divmod(self.ids[g], 64)
+            words[word] |= np.uint64(1) << np.uint64(bit)
+        return words
+
+    def resolve(self, name):
+        """Vocabulary entries meant by `name`: exact (case-insensitive) match, else substring matches."""
+        name = name.strip().lower()
+        exact = [g for g in self.vocab if g.lower() == name]
+        return exact or [g for g in self.vocab if name in g.lower()]
+
+    def mask(self, all_of=(), any_of=(), none_of=(), rows=None):
+        """
+        Boolean row mask: has every genre in all_of, at least one of any_of, none of none_of.
+        With `rows`, the mask covers just those row positions.
+        """
+        bits = self.bits if rows is None else self.bits[rows]
+        keep = np.ones(len(bits), dtype=bool)
+        if all_of:
+            need = self.bits_for(all_of)
+            keep &= ((bits & need) == need).all(axis=1)
+        if any_of:
+            keep &= (bits & self.bits_for(any_of)).any(axis=1)
+        if none_of:
+            keep &= ~(bits & self.bits_for(none_of)).any(axis=1)
+        return keep
+
+    def parse(self, text):
+        # Query string -> [(negated, [genres])] with names resolved; see query()
+        terms = []
+        for term in text.split(','):
+            term = term.strip()
+            if not term:
+                continue
+            negate = term[0] in '-!'
+            if negate:
+                term = term[1:]
+            terms.append((negate, [g for alt in term.split('|') for g in self.resolve(alt) if alt.strip()]))
+        return terms
+
+    def query(self, text, rows=None):
+        """
+        Mask for a genre query string. Comma-separated terms are ANDed, '|' inside a term
+        means OR, and a leading '-' or '!' negates a term:
+          "Drama"                      -> Drama
+          "Crime, Drama"               -> Crime AND Drama
+          "Comedy|Romance, -Horror"    -> (Comedy OR Romance) AND NOT Horror
+        Names are matched case-insensitively; a partial name ("sci") matches every genre containing it.
+        With `rows`, the mask covers just those row positions.
+        """
+        keep = np.ones(len(self.bits) if rows is None else len(rows), dtype=bool)
+        for negate, genres in self.parse(text):
+            if negate:
+                if genres:
+                    keep &= self.mask(none_of=genres, rows=rows)
+            elif genres:
+                keep &= self.mask(any_of=genres, rows=rows)
+            else:
+                keep[:] = False
+        return keep
+
+    def top_genres(self, n=None):
+        # (genre, count) pairs for the menu, most common first
+        order = np.argsort(-self.counts, kind='stable')[:n]
+        return [(self.vocab[i], int(self.counts[i])) for i in order]
+
+@staged('genre_index')
+def build_genre_index(df):
+    start = time.perf_counter()
+    index = GenreIndex(df['Genre'])
+    status(Fore.GREEN, f"Genre index: {len(index.vocab)} genres, {index.bits.nbytes / 1e3:.1f} kB of bits, "
+           f"built in {time.perf_counter() - start:.3f}s")
+    return index
+
 def list_genres(df):
-    all_genres = set()
-    for g in df['Genre'].fillna(''):
-        for part in re.split(r',|\|', str(g)):
-            part = part.strip()
-            if part:
-                all_genres.add(part)
-    return sorted(all_genres)
+    return GenreIndex(df['Genre']).vocab
+
+# ---------------------------
+# Read-only columnar catalog
+# ---------------------------
+# Sentiment codes stored by Catalog.sentiment index into this tuple
+SENTIMENTS = ('Negative', 'Neutral', 'Positive')
+
+def sentiment_codes(polarity):
+    # int8 index into SENTIMENTS, with the same thresholds as sentiment_label()
+    polarity = np.asarray(polarity)
+    return (polarity >= -0.25).astype(np.int8) + (polarity > 0.25)
+
+class RangeIndex:
+    """
+    Row ids of one numeric column sorted by value (ties by row id), with the sorted values
+    alongside, so every value range is two searchsorted calls and a slice of `order`.
+    Bounds are compared in the column's dtype, exactly like `column >= lo` would.
+    """
+
+    def __init__(self, column, order, values):
+        self.column = column
+        self.order = order
+        self.values = values
+
+    @classmethod
+    def build(cls, column):
+        order = np.argsort(column, kind='stable')
+        values = column[order]
+        for array in (order, values):
+            array.flags.writeable = False
+        return cls(column, order, values)
+
+    def __len__(self):
+        return len(self.order)
+
+    def memory_bytes(self):
+        return self.order.nbytes + self.values.nbytes
+
+    def span(self, lo=None, hi=None):
+        # Positions [start, end) in `order` of the rows with lo <= value <= hi
+        start = 0 if lo is None else int(np.searchsorted(self.values, self.values.dtype.type(lo), side='left'))
+        end = len(self) if hi is None else int(np.searchsorted(self.values, self.values.dtype.type(hi), side='right'))
+        return start, max(start, end)
+
+    def rows(self, lo=None, hi=None):
+        start, end = self.span(lo, hi)
+        return self.order[start:end]
+
+    def mask(self, lo=None, hi=None):
+        """
+        Boolean row mask of lo <= value <= hi. No scan when the range keeps every row or only
+        a few (or all but a few) rows; otherwise a plain comparison is cheaper than a scatter.
+        """
+        start, end = self.span(lo, hi)
+        n = len(self)
+        if (end - start) * 8 <= n:
+            keep = np.zeros(n, dtype=bool)
+            keep[self.order[start:end]] = True
+        elif (n - end + start) * 8 <= n:
+            keep = np.ones(n, dtype=bool)
+            keep[self.order[:start]] = False
+            keep[self.order[end:]] = False
+        else:
+            keep = np.ones(n, dtype=bool)
+            if lo is not None:
+                keep &= self.column >= self.values.dtype.type(lo)
+            if hi is not None:
+                keep &= self.column <= self.values.dtype.type(hi)
+        return keep
+
+class Catalog:
+    """
+    Immutable columnar view of the movie catalog used by the query path. Ratings and polarity
+    are read-only NumPy arrays, sentiment is int8 codes into SENTIMENTS and genres are the
+    GenreIndex bit rows; text columns keep the frame's own arrays and are never copied.
+    Sorted RangeIndexes over rating and polarity are built on first use.
+    Queries work with boolean masks and row positions, and row() materialises the text fields
+    only for the rows actually returned.
+    """
+
+    __slots__ = ('title', 'genre', 'overview', 'rating', 'polarity', '_sentiment', '_genre_index',
+                 '_rating_range', '_polarity_range')
+
+    def __init__(self, title, genre, overview, rating, polarity, genre_index=None,
+                 rating_range=None, polarity_range=None):
+        rating = np.asarray(rating)
+        polarity = np.asarray(polarity, dtype=np.float64)
+        for column in (rating, polarity):
+            if column.flags.writeable:
+                column.flags.writeable = False
+        for name, value in (('title', title), ('genre', genre), ('overview', overview), ('rating', rating),
+                            ('polarity', polarity), ('_sentiment', None), ('_genre_index', genre_index),
+                            ('_rating_range', rating_range), ('_polarity_range', polarity_range)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Catalog is read-only")
+
+    @classmethod
+    def from_frame(cls, df, genre_index=None):
+        """Wrap a load_data() frame without copying its columns (adds sentiment if missing)."""
+        ensure_sentiment(df)
+        return cls(df['Title'].array, df['Genre'].array, df['Overview'].array,
+                   df['IMDb_Rating'].to_numpy(), df['Polarity'].to_numpy(np.float64), genre_index)
+
+    @classmethod
+    def of(cls, data, genre_index=None):
+        # Catalogs pass through; DataFrames are wrapped (cheap, but keep a Catalog for repeated queries)
+        return data if isinstance(data, cls) else cls.from_frame(data, genre_index)
+
+    def __len__(self):
+        return len(self.rating)
+
+    @property
+    def sentiment(self):
+        # Derived from polarity on first use
+        if self._sentiment is None:
+            codes = sentiment_codes(self.polarity)
+            codes.flags.writeable = False
+            object.__setattr__(self, '_sentiment', codes)
+        return self._sentiment
+
+    @property
+    def genre_index(self):
+        if self._genre_index is None:
+            object.__setattr__(self, '_genre_index', GenreIndex(pd.Series(self.genre)))
+        return self._genre_index
+
+    @property
+    def rating_range(self):
+        if self._rating_range is None:
+            object.__setattr__(self, '_rating_range', RangeIndex.build(self.rating))
+        return self._rating_range
+
+    @property
+    def polarity_range(self):
+        if self._polarity_range is None:
+            object.__setattr__(self, '_polarity_range', RangeIndex.build(self.polarity))
+        return self._polarity_range
+
+    def rating_mask(self, min_rating):
+        # Rows rated at least min_rating; served by the range index once it exists, so a
+        # frame wrapped for a single call does not pay for sorting
+        if self._rating_range is not None:
+            return self._rating_range.mask(lo=min_rating)
+        return self.rating >= float(min_rating)
+
+    def titles(self):
+        # Titles as an object array with missing values blanked, for building a TitleIndex
+        return pd.Series(self.title).fillna('').values
+
+    def row(self, idx, similarity=None, score=None):
+        result = {
+            'Title': self.title[idx],
+            'Genre': self.genre[idx],
+            'IMDb_Rating': round(float(self.rating[idx]), 3),  # float32 column; drop the 7.800000190734863 noise
+            'Overview': self.overview[idx],
+            'Polarity': float(self.polarity[idx]),
+            'Sentiment': SENTIMENTS[self.sentiment[idx]]
+        }
+        if similarity is not None:
+            result['Similarity'] = float(similarity)
+        if score is not None:
+            result['Score'] = float(score)
+        return result
+
+# ---------------------------
+# Best-by-rating views
+# ---------------------------
+class RatingViews:
+    """
+    Row ids pre-sorted by rating (best first, ties by row id) for every (genre, sentiment) pair,
+    where None stands for "any" on either side. A no-seed query reads the few lists its genre
+    and mood select: searchsorted drops the rows under min_rating, the lists are merged, and
+    only as many entries as are needed to settle the top_n (with ties) are looked at.
+    lists[key] = (rows, -ratings), both ascending in -rating. add_rows()/remove_rows() keep
+    them current as the catalog changes.
+    """
+
+    def __init__(self, lists):
+        self.lists = lists
+
+    @classmethod
+    def build(cls, catalog):
+        order = np.argsort(-catalog.rating, kind='stable')
+        neg = -catalog.rating[order]
+        sentiment = catalog.sentiment[order]
+        genre_index = catalog.genre_index
+        lists = {}
+        for genre in [None] + list(genre_index.vocab):
+            has = np.ones(len(order), dtype=bool) if genre is None else genre_index.mask(any_of=[genre], rows=order)
+            for code in (None,) + tuple(range(len(SENTIMENTS))):
+                sel = has if code is None else has & (sentiment == code)
+                lists[(genre, code)] = (order[sel], neg[sel])
+        return cls(lists)
+
+    def memory_bytes(self):
+        return sum(rows.nbytes + neg.nbytes for rows, neg in self.lists.values())
+
+    # -- queries ---------------------------------------------------------------
+    def best(self, keys, min_rating, top_n, ok=None):
+        """
+        Rows rated at least min_rating from the union of the lists for `keys`, best first, that
+        pass the optional `ok(rows) -> mask` filter: the top_n and every row tied with the last
+        of them (like _rated_pool). Returns (rows, ratings).
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        lists = []
+        for key in keys:
+            rows, neg = self.lists.get(key, empty)
+            # Compare in the column's dtype, exactly like `rating >= min_rating` in _filter_mask
+            end = np.searchsorted(neg, neg.dtype.type(-float(min_rating)), side='right')
+            lists.append((rows[:end], neg[:end]))
+        m = max(4 * top_n, 64)
+        while True:
+            rows = np.concatenate([r[:m] for r, _ in lists] or [empty[0]])
+            neg = np.concatenate([n[:m] for _, n in lists] or [empty[1]])
+            if len(lists) > 1:
+                order = np.lexsort((rows, neg))
+                rows, neg = rows[order], neg[order]
+                fresh = np.ones(len(rows), dtype=bool)
+                fresh[1:] = rows[1:] != rows[:-1]  # a row listed under two genres is adjacent to itself
+                rows, neg = rows[fresh], neg[fresh]
+            if ok is not None:
+                passed = ok(rows)
+                rows, neg = rows[passed], neg[passed]
+            exhausted = all(len(r) <= m for r, _ in lists)
+            if len(rows) >= top_n:
+                cutoff = neg[top_n - 1]
+                # Done once every unread entry rates strictly below the top_n-th row
+                if all(len(n) <= m or n[m] > cutoff for _, n in lists):
+                    end = np.searchsorted(neg, cutoff, side='right')
+                    return rows[:end], -neg[:end]
+            elif exhausted:
+                return rows, -neg
+            m *= 4
+
+    def recommend(self, genre_choice, min_rating, mood_label, top_n, genre_index):
+        """
+        The no-seed flow (genre filter, rating floor, mood with the Neutral/any fallback of
+        _mood_rows) answered from the views. Returns (rows, ratings) like _rated_pool.
+        """
+        sources, ok = [None], None
+        if genre_choice:
+            terms = genre_index.parse(genre_choice)
+            positive = [genres for negate, genres in terms if not negate]
+            if any(not genres for genres in positive):
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            if positive:
+                # Read the lists of the rarest OR-group; any other term is checked on those rows only
+                sources = min(positive, key=lambda genres: sum(genre_index.counts[genre_index.ids[g]] for g in genres))
+            if len(terms) > 1 or not positive:
+                ok = lambda rows: genre_index.query(genre_choice, rows)
+        codes = [SENTIMENTS.index(mood_label), SENTIMENTS.index('Neutral')] if mood_label else []
+        for code in codes + [None]:
+            rows, ratings = self.best([(g, code) for g in sources], min_rating, top_n, ok)
+            if len(rows) or code is None:
+                return rows, ratings
+
+    # -- updates ---------------------------------------------------------------
+    def add_rows(self, first_row, ratings, polarity, genre_strings):
+        """Insert new rows first_row, first_row + 1, ... (ids above every existing row)."""
+        ratings = np.asarray(ratings, dtype=np.float32)
+        codes = sentiment_codes(polarity)
+        new = {}
+        for i, genre_string in enumerate(genre_strings):
+            for genre in [None] + (split_genres(genre_string) if isinstance(genre_string, str) else []):
+                for code in (None, int(codes[i])):
+                    new.setdefault((genre, code), []).append(i)
+        for key, members in new.items():
+            members = np.array(members)
+            rows, neg = self.lists.get(key, (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)))
+            rows = np.concatenate([rows, first_row + members])
+            neg = np.concatenate([neg, -ratings[members]])
+            order = np.lexsort((rows, neg))
+            self.lists[key] = (rows[order], neg[order])
+        for genre in {g for g, _ in new} - {None}:
+            for code in range(len(SENTIMENTS)):
+                self.lists.setdefault((genre, code), (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)))
+
+    def remove_rows(self, removed):
+        """Drop the rows flagged in the boolean `removed` mask and shift later row ids down."""
+        new_id = np.cumsum(~removed) - 1
+        for key, (rows, neg) in self.lists.items():
+            keep = ~removed[rows]
+            self.lists[key] = (new_id[rows[keep]], neg[keep])
+
+@staged('range_indexes')
+def build_range_indexes(catalog):
+    # Sort the rating and polarity columns now rather than on the first query
+    start = time.perf_counter()
+    size = catalog.rating_range.memory_bytes() + catalog.polarity_range.memory_bytes()
+    status(Fore.GREEN, f"Range indexes: rating + polarity, {size / 1e6:.1f} MB, "
+           f"built in {time.perf_counter() - start:.3f}s")
+
+@staged('rating_views')
+def build_rating_views(catalog):
+    start = time.perf_counter()
+    views = RatingViews.build(catalog)
+    status(Fore.GREEN, f"Rating views: {len(views.lists)} lists, {views.memory_bytes() / 1e6:.1f} MB, "
+           f"built in {time.perf_counter() - start:.3f}s")
+    return views
+
+# ---------------------------
+# Ranking helpers
+# ---------------------------
+def _filter_mask(catalog, genre_choice, min_rating):
+    # Positional mask of rows passing the genre and rating filters
+    keep = catalog.rating_mask(min_rating)
+    if genre_choice:
+        keep &= catalog.genre_index.query(genre_choice)
+    return keep
+
+def _mood_rows(catalog, keep, mood_label):
+    # Rows matching the mood, relaxing to Neutral and then to everything when nothing matches
+    rows = np.flatnonzero(keep)
+    if mood_label and rows.size:
+        sentiment = catalog.sentiment[rows]
+        for wanted in (mood_label, 'Neutral'):
+            matched = rows[sentiment == SENTIMENTS.index(wanted)]
+            if matched.size:
+                return matched
+    return rows
+
+def _mood_window_pool(catalog, genre_choice, min_rating, mood_polarity, top_n):
+    """
+    (rows, ratings) like _rated_pool() over the titles passing the genre and rating filters whose
+    polarity lies within MOOD_POLARITY_WINDOW of mood_polarity; the window doubles until top_n
+    titles match or it covers the whole [-1, 1] polarity range. Both bounds are range lookups. A narrow window is
+    walked in full and checked against the ratings; a wide one is checked while walking down
+    the rating order, stopping as soon as the top_n (and their ties) are settled.
+    """
+    ratings, polarity = catalog.rating_range, catalog.polarity_range
+    r_start, r_end = ratings.span(lo=min_rating)
+    best_first = ratings.order[r_start:r_end][::-1]
+    # Polarity lives in [-1, 1], so once clamped a window of 2 covers every title; the bound also
+    # stops the doubling for a non-finite mood_polarity that got past normalize_query()
+    mood_polarity = min(max(mood_polarity, -1.0), 1.0)
+    window = MOOD_POLARITY_WINDOW
+    while True:
+        lo, hi = mood_polarity - window, mood_polarity + window
+        p_start, p_end = polarity.span(lo, hi)
+        whole = (p_start == 0 and p_end == len(polarity)) or window >= 2
+        # Walking the window costs its length; walking the ratings about top_n / (share in the window)
+        if (p_end - p_start) ** 2 <= 64 * max(top_n, 1) * len(best_first):
+            rows = polarity.order[p_start:p_end]
+            rows = rows[catalog.rating[rows] >= ratings.values.dtype.type(min_rating)]
+            count('rows_scanned', p_end - p_start)
+            if genre_choice and rows.size:
+                rows = rows[catalog.genre_index.query(genre_choice, rows)]
+            if len(rows) >= top_n or whole:
+                return _rated_pool(catalog, rows, top_n)
+        else:
+            m = max(4 * top_n, 64)
+            while True:
+                rows = best_first[:m]
+                pol = catalog.polarity[rows]
+                rows = rows[(pol >= lo) & (pol <= hi)]
+                if genre_choice and rows.size:
+                    rows = rows[catalog.genre_index.query(genre_choice, rows)]
+                if len(rows) >= top_n:
+                    cutoff = catalog.rating[rows[top_n - 1]]
+                    # Done once every unread title rates strictly below the top_n-th match
+                    if m >= len(best_first) or catalog.rating[best_first[m]] < cutoff:
+                        count('rows_scanned', min(m, len(best_first)))
+                        rows = rows[catalog.rating[rows] >= cutoff]
+                        return rows, catalog.rating[rows]
+                elif m >= len(best_first):
+                    break
+                m *= 4
+            count('rows_scanned', len(best_first))
+            if whole:
+                return rows, catalog.rating[rows]
+        window *= 2
+
+def _best_rated(catalog, rows, top_n, randomize=False):
+    # Highest rated rows first; shuffling before the stable sort randomizes ties
+    rows = np.array(rows)
+    if randomize:
+        np.random.shuffle(rows)
+    order = np.argsort(-catalog.rating[rows], kind='stable')
+    return rows[order[:top_n]]
+
+def _similar_pool(seed_idx, indices, scores, keep, limit):
+    # First `limit` candidates (in similarity order) allowed by the filter mask
+    indices = np.asarray(indices)
+    scores = np.asarray(scores)
+    ok = keep[indices] & (indices != seed_idx) & np.isfinite(scores)
+    return indices[ok][:limit], scores[ok][:limit]
+
+def _blend(similarity, ratings, rating_weight):
+    # Ranking score: (1 - w) * similarity + w * rating on a 0-1 scale
+    if not rating_weight:
+        return similarity
+    return (1.0 - rating_weight) * similarity + rating_weight * (ratings / RATING_SCALE)
+
+def _top_k(scores, k):
+    # Indices of the k largest finite scores, best first, in O(N) rather than a full sort
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+def centroid_similarities(tfidf_matrix, liked_rows, disliked_rows=()):
+    """
+    Cosine similarity of every row to the centroid of the liked rows minus DISLIKE_WEIGHT times
+    the centroid of the disliked rows. The centroid stays sparse and the catalog is scored with
+    one sparse matrix-vector product.
+    """
+    n = tfidf_matrix.shape[0]
+    rows = np.concatenate([liked_rows, disliked_rows]).astype(np.int64)
+    weights = np.concatenate([np.full(len(liked_rows), 1.0 / max(len(liked_rows), 1)),
+                              np.full(len(disliked_rows), -DISLIKE_WEIGHT / max(len(disliked_rows), 1))])
+    centroid = sparse.csr_matrix((weights, (np.zeros(len(rows), dtype=np.int64), rows)), shape=(1, n)) @ tfidf_matrix
+    centroid = sparse.csr_matrix(centroid)
+    norm = np.sqrt((centroid.data ** 2).sum())
+    dense = np.zeros(tfidf_matrix.shape[1])
+    dense[centroid.indices] = centroid.data / (norm or 1.0)
+    return tfidf_matrix @ dense
+
+def mmr_rerank(tfidf_matrix, rows, relevance, top_n, diversity):
+    """
+    Maximal marginal relevance over a small candidate block: repeatedly pick the candidate
+    maximising (1 - diversity) * relevance - diversity * (max similarity to those already picked).
+    Returns positions into `rows`, in pick order.
+    """
+    candidates = tfidf_matrix[rows]
+    pairwise = (candidates @ candidates.T).toarray()
+    closest = np.zeros(len(rows))
+    taken = np.zeros(len(rows), dtype=bool)
+    picks = []
+    for _ in range(min(top_n, len(rows))):
+        mmr = (1.0 - diversity) * relevance - diversity * closest
+        mmr[taken] = -np.inf
+        j = int(np.argmax(mmr))
+        picks.append(j)
+        taken[j] = True
+        closest = np.maximum(closest, pairwise[j])
+    return np.array(picks, dtype=np.int64)
+
+def _rated_pool(catalog, rows, top_n):
+    # Every row rated at least as high as the top_n-th best, so ties can still be shuffled later
+    ratings = catalog.rating[rows]
+    if len(rows) > top_n:
+        cutoff = np.partition(ratings, len(rows) - top_n)[len(rows) - top_n]
+        rows, ratings = rows[ratings >= cutoff], ratings[ratings >= cutoff]
+    return rows, ratings
+
+def _rank_pool(scores, top_n, randomize):
+    # Positions of the best top_n scores; shuffling before the stable sort randomizes ties
+    order = np.arange(len(scores))
+    if randomize:
+        np.random.shuffle(order)
+    return order[np.argsort(-scores[order], kind='stable')][:top_n]
+
+# ---------------------------
+# Query result cache
+# ---------------------------
+class ResultCache:
+    """
+    Bounded LRU cache of ranked candidate pools (row ids + scores, never DataFrames) keyed by
+    the normalized query. Every entry belongs to one catalog version; looking up with a
+    different version clears the cache. Randomized tie-breaking happens after the lookup,
+    so cached answers still vary between calls.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.version = None
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @staticmethod
+    def key(title_based, genre_choice, min_rating, mood_label, top_n, rating_weight=0.0, liked=(), disliked=(),
+            mood_polarity=None):
+        genre = re.sub(r'\s*([,|])\s*', r'\1', ' '.join(genre_choice.lower().split())) if genre_choice else None
+        return (normalize_title(title_based) if title_based else None, genre,
+                float(min_rating), mood_label or None, int(top_n), float(rating_weight or 0.0),
+                tuple(sorted(normalize_title(t) for t in liked or ())),
+                tuple(sorted(normalize_title(t) for t in disliked or ())),
+                None if mood_polarity is None else float(mood_polarity))
+
+    def get(self, key, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self.version = version
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'size': len(self), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
 
 # ---------------------------
 # Recommendation logic
 # ---------------------------
 def recommend_movies(df, tfidf_matrix, title_based=None, genre_choice=None, min_rating=0.0,
-                     mood_label=None, top_n=5, randomize=True):
-    candidates = df.copy()
-    # Genre filter
-    if genre_choice:
-        candidates = candidates[candidates['Genre'].str.contains(re.escape(genre_choice), case=False, na=False)]
-    # Rating filter
-    candidates = candidates[candidates['IMDb_Rating'] >= float(min_rating)]
-    if candidates.empty:
-        return []
+                     mood_label=None, top_n=5, randomize=True, neighbours=None, title_index=None,
+                     genre_index=None, ann_index=None, cache=None, catalog_version=None,
+                     rating_weight=0.0, diversity=0.0, rating_views=None, liked=None, disliked=None,
+                     mood_polarity=None):
+    """
+    df: a Catalog (see Catalog.from_frame), or a load_data() frame which is wrapped on each call.
+    neighbours: optional (indices, scores) table from build_neighbour_table(). When given,
+    title-based queries are answered from the seed's stored neighbours and only fall back to
+    a full cosine pass if the filters leave fewer than top_n of them.
+    Sentiment comes from the catalog's Polarity column (see load_or_build_sentiment).
+    title_index: TitleIndex built once at load time (see build_title_index); built on demand if omitted.
+    genre_choice: a genre or a GenreIndex.query() expression such as "Comedy|Romance, -Horror".
+    genre_index: GenreIndex built once at load time (see build_genre_index); built on demand if
+    omitted. Ignored when df is already a Catalog, which carries its own.
+    ann_index: optional IVFIndex over LSA embeddings (embedding mode); used for seed queries when
+    there is no neighbour table, again falling back to the exact path if too few rows pass the filters.
+    cache / catalog_version: optional ResultCache and the version of the catalog it is valid for.
+    rating_weight: blend for seed queries, score = (1 - w) * similarity + w * rating / 10 (0 = similarity only).
+    The blend re-ranks the top_n * 4 most similar titles passing the filters, whichever of the
+    neighbour table, the ANN index or the exact scan found them.
+    diversity: 0-1; above 0, seed results are re-ranked with maximal marginal relevance so
+    near-duplicate recommendations are spread out.
+    rating_views: RatingViews for this catalog (see build_rating_views); answers queries without
+    a seed title from pre-sorted lists instead of scanning every row.
+    liked / disliked: lists of titles for "more like these" queries. title_based counts as one
+    more liked title; with more than one seed, or any disliked title, the catalog is ranked
+    against a weighted centroid of the seeds (see centroid_similarities) and the seeds themselves
+    are left out of the results.
+    mood_polarity: the user's mood as a -1..1 score (see analyze_sentiment). Takes the place of
+    mood_label: titles with the closest polarity are picked through the sorted range indexes
+    (see _mood_window_pool) before ranking by rating.
+    With profiling enabled (see enable_profiling) each call writes a 'query' record.
+    """
+    catalog = Catalog.of(df, genre_index)
+
+    def build():
+        return _candidate_pool(catalog, tfidf_matrix, title_based, genre_choice, min_rating, mood_label,
+                               top_n, neighbours, title_index, ann_index, rating_weight, rating_views,
+                               liked, disliked, mood_polarity)
+    with profiled('query', title_based=title_based, genre_choice=genre_choice, min_rating=min_rating,
+                  mood_label=mood_label, mood_polarity=mood_polarity, top_n=top_n, liked=liked, disliked=disliked):
+        if cache is not None:
+            key = ResultCache.key(title_based, genre_choice, min_rating, mood_label, top_n, rating_weight,
+                                  liked, disliked, mood_polarity)
+            entry = cache.get(key, catalog_version)
+            count('cache_hits' if entry is not None else 'cache_misses')
+            if entry is None:
+                entry = build()
+                cache.put(key, entry)
+        else:
+            entry = build()
+
+        rows, scores, sims = entry
+        with stage('assembly'):
+            if sims is None:
+                results = [catalog.row(idx) for idx in rows[_rank_pool(scores, top_n, randomize)]]
+            else:
+                order = _rank_pool(scores, len(rows) if diversity else top_n, randomize)
+                if diversity and len(order) > 1:
+                    order = order[mmr_rerank(tfidf_matrix, rows[order], scores[order], top_n, diversity)]
+                show_score = bool(rating_weight)
+                results = [catalog.row(rows[i], sims[i], scores[i] if show_score else None) for i in order]
+        count('rows_returned', len(results))
+        return results
+
+def _candidate_pool(catalog, tfidf_matrix, title_based, genre_choice, min_rating, mood_label, top_n,
+                    neighbours, title_index, ann_index, rating_weight=0.0, rating_views=None,
+                    liked=None, disliked=None, mood_polarity=None):
+    """
+    Candidates for one query as (rows, scores, similarities); _rank_pool() picks the final
+    top_n from it. For seed queries scores are the (optionally rating-blended) ranking scores
+    and similarities the raw cosine values; otherwise scores are ratings and similarities is None.
+    """
+    liked = ([title_based] if title_based else []) + list(liked or [])
+    disliked = list(disliked or [])
+    if liked:
+        with stage('filter'):
+            keep = _filter_mask(catalog, genre_choice, min_rating)
+            count('rows_scanned', len(catalog))
+        if not keep.any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0), None
+        if title_index is None:
+            with stage('title_index'):
+                title_index = TitleIndex(catalog.titles())
+        if len(liked) > 1 or disliked:
+            pool = _centroid_pool(catalog, tfidf_matrix, liked, disliked, keep, top_n, title_index, rating_weight)
+            if pool is not None:
+                return pool
+            title_based = None  # none of the liked titles were found
+        else:
+            title_based = liked[0]
 
     # Title-based with cosine similarity
     if title_based:
-        matches = candidates[candidates['Title'].str.lower().str.contains(title_based.lower())]
-        if matches.empty:
-            matches = df[df['Title'].str.lower().str.contains(title_based.lower())]
-        if matches.empty:
-            exact = df[df['Title'].str.lower() == title_based.lower()]
-            if not exact.empty:
-                matches = exact
-        if matches.empty:
-            seed_idx = None
-        else:
-            seed_title = matches.iloc[0]['Title']
-            # get positional index into df (iloc index)
-            seed_idx_list = df.index[df['Title'] == seed_title].tolist()
-            seed_idx = seed_idx_list[0] if seed_idx_list else None
+        # Positional row id, preferring a seed that itself passes the filters
+        with stage('title_lookup'):
+            seed_idx = title_index.lookup(title_based, prefer=keep)
 
         if seed_idx is not None:
-            sims = cosine_similarity(tfidf_matrix[seed_idx], tfidf_matrix).flatten()
-            sim_indices = sims.argsort()[::-1]
-            results = []
-            for idx in sim_indices:
-                if idx == seed_idx:
-                    continue
-                row = df.iloc[idx]
-                if row['IMDb_Rating'] < min_rating:
+            with stage('similarity'):
+                pool = None
+                if neighbours is not None:
+                    nbr_idx, nbr_scores = neighbours
+                    pool = _similar_pool(seed_idx, nbr_idx[seed_idx], nbr_scores[seed_idx], keep, top_n * 4)
+                    count('rows_scanned', nbr_idx.shape[1])
+                    # A rating blend re-ranks all top_n * 4 candidates, so it needs every one of them
+                    if len(pool[0]) < (top_n * 4 if rating_weight else top_n) and nbr_idx.shape[1] < len(catalog) - 1:
+                        pool = None  # filters exhausted the stored neighbours
+                elif ann_index is not None:
+                    rows, _ = ann_index.search(ann_index.vectors[seed_idx], top_n * 4, keep=keep, exclude=seed_idx)
+                    # The ANN index only proposes candidates; score them with the same TF-IDF cosine
+                    # as the exact path so similarities (and rating blends) share one scale
+                    scores = (tfidf_matrix[rows] @ tfidf_matrix[seed_idx].T).toarray().ravel()
+                    order = np.argsort(-scores, kind='stable')
+                    pool = _similar_pool(seed_idx, rows[order], scores[order], keep, top_n * 4)
+                    count('rows_scanned', len(rows))
+                    if len(pool[0]) < (top_n * 4 if rating_weight else top_n):
+                        pool = None  # the probed cells held too few rows passing the filters
+                ratings = catalog.rating
+                if pool is not None:
+                    rows, sims = pool
+                    return rows, _blend(sims, ratings[rows], rating_weight), sims
+                # Exact path: score every row, mask out rejected ones and partition; the cost does not
+                # depend on how many rows the filters reject.
+                # Rows are L2-normalised, so the sparse dot product is the cosine similarity
+                sims = (tfidf_matrix[seed_idx] @ tfidf_matrix.T).toarray().ravel()
+                count('rows_scanned', len(sims))
+                masked = np.where(keep, sims, -np.inf)
+                masked[seed_idx] = -np.inf
+                rows = _top_k(masked, top_n * 4)
+                return rows, _blend(sims[rows], ratings[rows], rating_weight), sims[rows]
+        # else fall through to non-title flow
+
+    # Non-title flow: titles whose polarity is close to the mood score, or matching the mood label
+    if mood_polarity is not None:
+        with stage('mood_window'):
+            rows, ratings = _mood_window_pool(catalog, genre_choice, min_rating, mood_polarity, top_n)
+        return rows, ratings, None
+    if rating_views is not None:
+        with stage('rating_views'):
+            rows, ratings = rating_views.recommend(genre_choice, min_rating, mood_label, top_n, catalog.genre_index)
+        return rows, ratings, None
+    with stage('filter'):
+        keep = _filter_mask(catalog, genre_choice, min_rating)
+        rows, ratings = _rated_pool(catalog, _mood_rows(catalog, keep, mood_label), top_n)
+        count('rows_scanned', len(catalog))
+    return rows, ratings, None
+
+def _centroid_pool(catalog, tfidf_matrix, liked, disliked, keep, top_n, title_index, rating_weight):
+    # Multi-seed candidates ranked against the seeds' centroid; None when no liked title resolves
+    with stage('title_lookup'):
+        liked_rows = [r for r in (title_index.lookup(t, prefer=keep) for t in liked) if r is not None]
+        if not liked_rows:
+            return None
+        disliked_rows = [r for r in (title_index.lookup(t) for t in disliked) if r is not None]
+    with stage('similarity'):
+        sims = centroid_similarities(tfidf_matrix, liked_rows, disliked_rows)
+        count('rows_scanned', len(sims))
+        masked = np.where(keep, sims, -np.inf)
+        masked[liked_rows + disliked_rows] = -np.inf
+        rows = _top_k(masked, top_n * 4)
+    return rows, _blend(sims[rows], catalog.rating[rows], rating_weight), sims[rows]
+
+# ---------------------------
+# Batch recommendations
+# ---------------------------
+# What a malformed query raises (see normalize_query); callers answering one query at a time
+# report these and keep going
+QUERY_ERRORS = (ValueError, TypeError, KeyError, OverflowError)
+
+BATCH_QUERY_DEFAULTS = {'title_based': None, 'genre_choice': None, 'min_rating': 0.0,
+                        'mood_label': None, 'mood_polarity': None, 'top_n': 5, 'rating_weight': 0.0, 'diversity': 0.0,
+                        'liked': None, 'disliked': None}
+
+def normalize_query(query):
+    """
+    Fill defaults and coerce types; unknown keys are kept so callers can pass ids through.
+    Fields of the wrong type raise ValueError. A free-text 'mood_text' is scored into a mood_polarity with analyze_sentiment().
+    """
+    q = dict(BATCH_QUERY_DEFAULTS)
+    q.update(query)
+    if q.get('mood_text') and not q['mood_label'] and q['mood_polarity'] is None:
+        q['mood_polarity'] = analyze_sentiment(q['mood_text'])[0]
+    q['mood_polarity'] = None if q['mood_polarity'] in (None, '') else float(q['mood_polarity'])
+    if q['mood_polarity'] is not None and not math.isfinite(q['mood_polarity']):
+        raise ValueError(f"mood_polarity must be a finite number, not {q['mood_polarity']!r}")
+    for name in ('title_based', 'genre_choice', 'mood_label'):
+        if q[name] is not None and not isinstance(q[name], str):
+            raise ValueError(f"{name} must be a string, not {type(q[name]).__name__}")
+        q[name] = q[name] or None
+    if q['mood_label'] is not None:
+        label = q['mood_label'].strip().capitalize()
+        if label not in SENTIMENTS:
+            raise ValueError(f"mood_label must be one of {', '.join(SENTIMENTS)}, not {q['mood_label']!r}")
+        q['mood_label'] = label
+    q['min_rating'] = float(q['min_rating'] or 0.0)
+    top_n = float(q['top_n'])
+    if not top_n.is_integer() or top_n < 1:
+        raise ValueError(f"top_n must be a whole number of at least 1, not {q['top_n']!r}")
+    q['top_n'] = int(top_n)
+    q['rating_weight'] = float(q['rating_weight'] or 0.0)
+    q['diversity'] = float(q['diversity'] or 0.0)
+    for name in ('liked', 'disliked'):
+        titles = [q[name]] if isinstance(q[name], str) else q[name]
+        q[name] = [str(t) for t in titles if t] if titles else None
+    return q
+
+def _top_similar_block(tfidf_matrix, seed_rows, keep, k):
+    """
+    Similarities of several seeds against the catalog as one sparse matrix-matrix product,
+    then the k most similar allowed rows per seed via argpartition. Returns a list of
+    (rows, sims), most similar first.
+    """
+    sims = (tfidf_matrix[seed_rows] @ tfidf_matrix.T).toarray()
+    sims[:, ~keep] = -np.inf
+    sims[np.arange(len(seed_rows)), seed_rows] = -np.inf
+    k = min(k, sims.shape[1])
+    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    out = []
+    for i in range(len(seed_rows)):
+        rows = top[i][np.argsort(-sims[i, top[i]], kind='stable')]
+        rows = rows[np.isfinite(sims[i, rows])]
+        out.append((rows, sims[i, rows]))
+    return out
+
+def recommend_batch(df, tfidf_matrix, queries, title_index=None, genre_index=None,
+                    block_size=1024, max_block_cells=1 << 25):
+    """
+    Answer many recommend_movies()-style queries (dicts with title_based, genre_choice,
+    min_rating, mood_label, mood_polarity, top_n, rating_weight, liked, disliked). Queries are read in
+    blocks; within a block they are grouped by filter so each mask is built once, single-seed
+    similarities are computed as one sparse product per group, and results are ranked without
+    randomization or diversity re-ranking.
+    Yields {'query': ..., 'results': [...]} in input order.
+    """
+    catalog = Catalog.of(df, genre_index)
+    title_index = title_index or TitleIndex(catalog.titles())
+    tfidf_matrix = sparse.csr_matrix(tfidf_matrix)
+    seeds_per_product = max(1, max_block_cells // max(len(catalog), 1))
+
+    queries = iter(queries)
+    while True:
+        block = [normalize_query(q) for _, q in zip(range(block_size), queries)]
+        if not block:
+            return
+        answers = [None] * len(block)
+        groups = {}
+        for i, q in enumerate(block):
+            groups.setdefault((q['genre_choice'], q['min_rating'], q['rating_weight']), []).append(i)
+
+        for (genre_choice, min_rating, rating_weight), members in groups.items():
+            keep = _filter_mask(catalog, genre_choice, min_rating)
+            if not keep.any():
+                for i in members:
+                    answers[i] = []
+                continue
+            seeded, mood_cache = [], {}
+            for i in members:
+                q = block[i]
+                seeds = ([q['title_based']] if q['title_based'] else []) + (q['liked'] or [])
+                if len(seeds) > 1 or (seeds and q['disliked']):
+                    pool = _centroid_pool(catalog, tfidf_matrix, seeds, q['disliked'] or [], keep, q['top_n'],
+                                          title_index, rating_weight)
+                    if pool is not None:
+                        rows, scores, sims = pool
+                        answers[i] = [catalog.row(rows[j], sims[j], scores[j] if rating_weight else None)
+                                      for j in _rank_pool(scores, q['top_n'], False)]
+                        continue
+                    seeds = []
+                seed_idx = title_index.lookup(seeds[0], prefer=keep) if seeds else None
+                if seed_idx is not None:
+                    seeded.append((i, seed_idx))
                     continue
-                if genre_choice and genre_choice.lower() not in str(row['Genre']).lower():
+                if q['mood_polarity'] is not None:
+                    rows, scores = _mood_window_pool(catalog, genre_choice, min_rating, q['mood_polarity'], q['top_n'])
+                    answers[i] = [catalog.row(idx) for idx in rows[_rank_pool(scores, q['top_n'], False)]]
                     continue
-                polarity, sentiment = analyze_sentiment(row['Overview'])
-                results.append({
-                    'Title': row['Title'],
-                    'Genre': row['Genre'],
-                    'IMDb_Rating': row['IMDb_Rating'],
-                    'Overview': row['Overview'],
-                    'Polarity': polarity,
-                    'Sentiment': sentiment,
-                    'Similarity': float(sims[idx])
-                })
-                if len(results) >= top_n * 4:
-                    break
-            if randomize:
-                random.shuffle(results)
-            results_sorted = sorted(results, key=lambda x: x['Similarity'], reverse=True)
-            return results_sorted[:top_n]
-        # else fall through to non-title flow
+                if q['mood_label'] not in mood_cache:
+                    mood_cache[q['mood_label']] = _best_rated(catalog, _mood_rows(catalog, keep, q['mood_label']), None)
+                answers[i] = [catalog.row(idx) for idx in mood_cache[q['mood_label']][:q['top_n']]]
+            for start in range(0, len(seeded), seeds_per_product):
+                chunk = seeded[start:start + seeds_per_product]
+                top_n = max(block[i]['top_n'] for i, _ in chunk)
+                ranked = _top_similar_block(tfidf_matrix, [s for _, s in chunk], keep, top_n * 4)
+                for (i, _), (rows, sims) in zip(chunk, ranked):
+                    # Same candidate set as recommend_movies(): the query's own top_n * 4 most similar
+                    n = block[i]['top_n']
+                    rows, sims = rows[:n * 4], sims[:n * 4]
+                    scores = _blend(sims, catalog.rating[rows], rating_weight)
+                    answers[i] = [catalog.row(rows[j], sims[j], scores[j] if rating_weight else None)
+                                  for j in _rank_pool(scores, n, False)]
 
-    # Non-title flow: sentiment matching
-    sentiments = []
-    for _, row in candidates.iterrows():
-        polarity, label = analyze_sentiment(row['Overview'])
-        sentiments.append((polarity, label))
-    candidates = candidates.reset_index(drop=True)
-    candidates['Polarity'] = [p for p, _ in sentiments]
-    candidates['Sentiment'] = [l for _, l in sentiments]
-
-    if mood_label:
-        filtered = candidates[candidates['Sentiment'] == mood_label]
-        if filtered.empty:
-            filtered = candidates[
-                (candidates['Sentiment'] == mood_label) |
-                (candidates['Sentiment'] == 'Neutral')
-            ]
-            if filtered.empty:
-                filtered = candidates
-        candidates = filtered
-
-    results = []
-    for _, row in candidates.iterrows():
-        results.append({
-            'Title': row['Title'],
-            'Genre': row['Genre'],
-            'IMDb_Rating': row['IMDb_Rating'],
-            'Overview': row['Overview'],
-            'Polarity': float(row['Polarity']),
-            'Sentiment': row['Sentiment']
-        })
+        for q, results in zip(block, answers):
+            yield {'query': q, 'results': results}
 
-    if randomize:
-        random.shuffle(results)
-    results_sorted = sorted(results, key=lambda x: x['IMDb_Rating'], reverse=True)
-    return results_sorted[:top_n]
+def _json_safe(value):
+    # NaN (e.g. a missing Overview) is not valid JSON
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+def write_jsonl(records, fp):
+    for record in records:
+        record = dict(record, results=[{k: _json_safe(v) for k, v in r.items()} for r in record['results']])
+        fp.write(json.dumps(record, ensure_ascii=False) + '\n')
+        fp.flush()
+
+def read_jsonl(fp):
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+# ---------------------------
+# Incremental catalog updates
+# ---------------------------
+# Hashed feature space for the incremental index; no vocabulary to refit when titles arrive
+HASHING_FEATURES = 1 << 18
+
+class IncrementalIndex:
+    """
+    A catalog whose TF-IDF rows and neighbour table can grow and shrink without a refit.
+
+    Text is vectorized with a stateless HashingVectorizer; document frequencies are kept as
+    running counts, and each row is weighted with the IDF current at its insertion. When the
+    catalog has grown or shrunk by more than `reweight_ratio` since the last weighting, every
+    row is re-weighted from its stored term counts (no re-tokenizing) and stored neighbour
+    scores are refreshed. Adding a title scores it against the catalog once and only touches
+    the neighbour lists it enters; removing titles recomputes only the lists that referenced them.
+
+    df / matrix() / neighbour_table() / rating_views() plug straight into recommend_movies(); `version`
+    increases on every change. After a re-weighting, neighbour list membership is kept as is
+    (only the scores are refreshed); build_neighbour_table(matrix()) gives an exact refresh.
+    """
+
+    def __init__(self, df, k=NEIGHBOUR_K, n_features=HASHING_FEATURES, reweight_ratio=0.25):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.hasher = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None,
+                                        stop_words=TFIDF_PARAMS['stop_words'])
+        self.k = k
+        self.reweight_ratio = reweight_ratio
+        self.version = 0
+        self._frames = [ensure_sentiment(df.reset_index(drop=True))]
+        self._tf = [self._term_counts(df)]
+        self.doc_freq = np.bincount(self._tf[0].indices, minlength=n_features).astype(np.int64)
+        self.n_docs = len(df)
+        self._weighted_at = self.n_docs
+        self._rows = [self._weight(self._tf[0])]
+        self._nbr_idx = self._nbr_scores = None
+        self._views = RatingViews.build(Catalog.from_frame(self._frames[0]))
+        if k:
+            self._nbr_idx, self._nbr_scores = build_neighbour_table(self._rows[0], k)
+            self.k = self._nbr_idx.shape[1]
+
+    # -- storage -------------------------------------------------------------
+    def __len__(self):
+        return self.n_docs
+
+    def _term_counts(self, df):
+        tf = sparse.csr_matrix(self.hasher.transform(df['combined_features'].values))
+        tf.sum_duplicates()  # one entry per (row, term), so indices count documents
+        return tf
+
+    def idf(self, terms=None):
+        # Same smoothing as TfidfVectorizer: log((1 + n) / (1 + df)) + 1, optionally only for `terms`
+        doc_freq = self.doc_freq if terms is None else self.doc_freq[terms]
+        return np.log((1.0 + self.n_docs) / (1.0 + doc_freq)) + 1.0
+
+    def _weight(self, tf):
+        # IDF-weight and L2-normalise rows, touching only their non-zero entries
+        data = tf.data * self.idf(tf.indices)
+        row_of = np.repeat(np.arange(tf.shape[0]), np.diff(tf.indptr))
+        norms = np.sqrt(np.bincount(row_of, weights=data * data, minlength=tf.shape[0]))
+        norms[norms == 0] = 1.0
+        return sparse.csr_matrix((data / norms[row_of], tf.indices.copy(), tf.indptr.copy()), shape=tf.shape)
+
+    def _consolidate(self):
+        # Appends are buffered as separate blocks; stack them once, on first read
+        if len(self._rows) > 1:
+            self._rows = [sparse.vstack(self._rows, format='csr')]
+            self._tf = [sparse.vstack(self._tf, format='csr')]
+        if len(self._frames) > 1:
+            self._frames = [_concat_chunks(self._frames)]
+
+    @property
+    def df(self):
+        self._consolidate()
+        return self._frames[0]
+
+    def matrix(self):
+        self._consolidate()
+        return self._rows[0]
+
+    def neighbour_table(self):
+        if self._nbr_idx is None:
+            return None
+        return self._nbr_idx[:self.n_docs], self._nbr_scores[:self.n_docs]
+
+    def rating_views(self):
+        return self._views
+
+    def _grow_neighbours(self, extra):
+        # Amortised O(1) appends: grow the neighbour arrays geometrically (n_docs already counts new rows)
+        needed = self.n_docs + extra
+        if needed > len(self._nbr_idx):
+            capacity = max(needed, int(len(self._nbr_idx) * 1.5) + 16)
+            for name in ('_nbr_idx', '_nbr_scores'):
+                old = getattr(self, name)
+                grown = np.zeros((capacity, old.shape[1]), dtype=old.dtype)
+                grown[:len(old)] = old
+                setattr(self, name, grown)
+
+    # -- updates -------------------------------------------------------------
+    def add_titles(self, new_df):
+        """
+        Append titles (a frame with Title, Genre, Overview, IMDb_Rating). Returns their row ids.
+        """
+        new_df = new_df.reset_index(drop=True).copy()
+        if 'combined_features' not in new_df.columns:
+            new_df['combined_features'] = (new_df['Genre'].astype(object).fillna('') + ' ' +
+                                           new_df['Overview'].fillna('').astype(object))
+        new_df['Genre'] = new_df['Genre'].astype('category')
+        new_df['IMDb_Rating'] = pd.to_numeric(new_df['IMDb_Rating'], errors='coerce').fillna(0.0).astype(np.float32)
+        add_sentiment_columns(new_df, compute_polarity(new_df['Overview'].fillna('').values))
+
+        tf = self._term_counts(new_df)
+        np.add.at(self.doc_freq, tf.indices, 1)
+        first = self.n_docs
+        self.n_docs += len(new_df)
+        rows = self._weight(tf)
+        self._frames.append(new_df[self._frames[0].columns])
+        self._views.add_rows(first, new_df['IMDb_Rating'].values, new_df['Polarity'].values,
+                             new_df['Genre'].astype(object).values)
+        self._tf.append(tf)
+        self._rows.append(rows)
+        if len(self._rows) > 64:
+            # Keep the pending tail short: merge the small appended blocks, not the big first one
+            self._rows[1:] = [sparse.vstack(self._rows[1:], format='csr')]
+            self._tf[1:] = [sparse.vstack(self._tf[1:], format='csr')]
+        if self._nbr_idx is not None and self.k:
+            self._grow_neighbours(0)
+            for i in range(len(new_df)):
+                self._insert_neighbours(first + i, rows[i])
+        self._after_change()
+        return np.arange(first, self.n_docs)
+
+    def _insert_neighbours(self, row_id, row_vec):
+        # Score the new row against every earlier row, block by block without stacking them;
+        # rows added after it in the same call insert themselves into its list in turn
+        dense = np.zeros(row_vec.shape[1])
+        dense[row_vec.indices] = row_vec.data
+        sims = np.concatenate([block @ dense for block in self._rows])[:row_id]
+        existing = row_id
+        k = min(self.k, existing)
+        if k == 0:
+            return
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind='stable')]
+        self._nbr_idx[row_id, :k] = top
+        self._nbr_scores[row_id, :k] = sims[top]
+        self._nbr_scores[row_id, k:] = -np.inf
+        # Only rows whose weakest stored neighbour scores below the new row are affected
+        affected = np.flatnonzero(sims > self._nbr_scores[:existing, -1])
+        if affected.size == 0:
+            return
+        idx = np.concatenate([self._nbr_idx[affected], np.full((affected.size, 1), row_id, np.int32)], axis=1)
+        scores = np.concatenate([self._nbr_scores[affected], sims[affected, None].astype(np.float32)], axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :self.k]
+        self._nbr_idx[affected] = np.take_along_axis(idx, order, axis=1)
+        self._nbr_scores[affected] = np.take_along_axis(scores, order, axis=1)
+
+    def remove_titles(self, row_ids):
+        """Remove titles by row id. Later rows shift down; their ids are remapped everywhere."""
+        self._consolidate()
+        removed = np.zeros(self.n_docs, dtype=bool)
+        removed[np.asarray(row_ids, dtype=np.int64)] = True
+        keep = ~removed
+        tf = self._tf[0]
+        np.subtract.at(self.doc_freq, tf[np.flatnonzero(removed)].indices, 1)
+        new_id = np.cumsum(keep) - 1
+
+        self._tf = [tf[keep]]
+        self._rows = [self._rows[0][keep]]
+        self._frames = [self._frames[0][keep].reset_index(drop=True)]
+        self._views.remove_rows(removed)
+        if self._nbr_idx is not None and self.k:
+            nbr_idx = self._nbr_idx[:self.n_docs][keep]
+            nbr_scores = self._nbr_scores[:self.n_docs][keep]
+            # Rows that listed a removed title need fresh lists; everyone else only gets remapped ids
+            affected = removed[nbr_idx].any(axis=1)
+            nbr_idx = new_id[nbr_idx].astype(np.int32)
+            self.n_docs = int(keep.sum())
+            self.k = min(self.k, self.n_docs - 1)
+            nbr_idx, nbr_scores = nbr_idx[:, :self.k], nbr_scores[:, :self.k]
+            if affected.any():
+                fresh_idx, fresh_scores = build_neighbour_table(self._rows[0], self.k, rows=np.flatnonzero(affected))
+                nbr_idx[affected], nbr_scores[affected] = fresh_idx, fresh_scores
+            self._nbr_idx, self._nbr_scores = nbr_idx, nbr_scores
+        else:
+            self.n_docs = int(keep.sum())
+        self._after_change()
+
+    def _after_change(self):
+        self.version += 1
+        drift = abs(self.n_docs - self._weighted_at) / max(self._weighted_at, 1)
+        if drift > self.reweight_ratio:
+            self.reweight()
+
+    def reweight(self):
+        """Re-weight all rows with the current IDF and refresh the stored neighbour scores."""
+        self._consolidate()
+        self._rows = [self._weight(self._tf[0])]
+        self._weighted_at = self.n_docs
+        if self._nbr_idx is not None and self.k:
+            matrix = self._rows[0]
+            idx = self._nbr_idx[:self.n_docs]
+            scores = np.empty(idx.shape, dtype=np.float32)
+            for start in range(0, self.n_docs, 4096):
+                end = min(start + 4096, self.n_docs)
+                left = matrix[np.repeat(np.arange(start, end), self.k)]
+                right = matrix[idx[start:end].ravel()]
+                scores[start:end] = np.asarray(left.multiply(right).sum(axis=1)).reshape(end - start, self.k)
+            order = np.argsort(-scores, axis=1, kind='stable')
+            self._nbr_idx = np.take_along_axis(idx, order, axis=1)
+            self._nbr_scores = np.take_along_axis(scores, order, axis=1)
 
 def display_recommendations(recs):
     if not recs:
@@ -220,24 +2341,210 @@ def display_recommendations(recs):
         short = (overview[:200] + '...') if len(overview) > 200 else overview
         print(Fore.RESET + f"   Overview: {short}\n")
 
+# ---------------------------
+# Command line
+# ---------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simple content-based movie recommender.")
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH,
+                        help="path to imdb_top_1000.csv, or a .parquet/.feather copy (default: %(default)s)")
+    parser.add_argument('--chunksize', type=int, metavar='ROWS',
+                        help="parse the catalog file in chunks of this many rows (bounds parser "
+                             "memory; the whole catalog is still loaded)")
+    parser.add_argument('--build-index', action='store_true',
+                        help="build the TF-IDF cache and neighbour table, then exit")
+    parser.add_argument('--neighbours', type=int, default=NEIGHBOUR_K,
+                        help="neighbours stored per title (default: %(default)s)")
+    parser.add_argument('--batch', metavar='QUERIES.jsonl',
+                        help="answer the JSON-lines queries in this file with recommend_batch() and exit")
+    parser.add_argument('--out', metavar='RESULTS.jsonl',
+                        help="where --batch/--headless write their JSON lines (default: stdout)")
+    parser.add_argument('--headless', action='store_true',
+                        help="non-interactive mode: read JSON query objects line by line and "
+                             "answer each one immediately as a JSON line")
+    parser.add_argument('--queries', metavar='QUERIES.jsonl',
+                        help="where --headless reads queries from (default: stdin)")
+    parser.add_argument('--embedding', type=int, nargs='?', const=EMBEDDING_DIMS, metavar='DIMS',
+                        help="answer seed queries from a dense LSA embedding with an approximate "
+                             "nearest-neighbour index instead of the neighbour table "
+                             f"(default width: {EMBEDDING_DIMS})")
+    parser.add_argument('--cache-size', type=int, default=RESULT_CACHE_SIZE,
+                        help="query results kept in the LRU cache, 0 to disable (default: %(default)s)")
+    parser.add_argument('--ann-report', action='store_true',
+                        help="print recall@10 and latency of the embedding ANN path vs the exact path, then exit")
+    parser.add_argument('--compact', choices=COMPACT_DTYPES, metavar='{float32,uint8}',
+                        help="answer queries from a compact memory-mapped TF-IDF index with float32 "
+                             "or 8-bit weights instead of the float64 matrix")
+    parser.add_argument('--prune', type=int, metavar='M',
+                        help="with --compact, keep only each title's M largest TF-IDF weights")
+    parser.add_argument('--compact-report', action='store_true',
+                        help="print size and recall@10 of the compact index formats vs full precision, then exit")
+    parser.add_argument('--profile', metavar='PROFILE.jsonl',
+                        help="append a JSON record of per-stage time, peak memory and row counters for the "
+                             "run and for every query to this file ('-' for stderr)")
+    return parser.parse_args(argv)
+
+def load_engine(data_path, k=NEIGHBOUR_K, embedding_dims=None, chunksize=None, cache_size=RESULT_CACHE_SIZE,
+                compact=None, top_m=None):
+    """
+    Load the catalog and every index once. The returned dict holds the keyword
+    arguments of recommend_movies() other than the query itself, with the catalog wrapped
+    once as a read-only Catalog. With embedding_dims
+    the O(N^2) neighbour table is skipped in favour of an LSA + IVF index. With compact
+    ('float32' or 'uint8') live queries use a CompactIndex; the neighbour table and ANN
+    index are still built from the full-precision matrix.
+    """
+    movies_df = load_data(data_path, chunksize)
+    tfidf_matrix, _ = load_or_build_tfidf(movies_df, data_path)
+    load_or_build_sentiment(movies_df, data_path)
+    genre_index = build_genre_index(movies_df)
+    catalog = Catalog.from_frame(movies_df, genre_index)
+    build_range_indexes(catalog)
+    engine = {
+        'df': catalog,
+        'tfidf_matrix': tfidf_matrix,
+        'neighbours': None,
+        'ann_index': None,
+        'title_index': build_title_index(movies_df),
+        'genre_index': genre_index,
+        'rating_views': build_rating_views(catalog),
+        'cache': ResultCache(cache_size) if cache_size else None,
+        # Content hash of the catalog file: a changed file means a new version and a cold cache
+        'catalog_version': tfidf_cache_key(data_path),
+    }
+    if embedding_dims:
+        engine['ann_index'] = load_or_build_ann(tfidf_matrix, data_path, embedding_dims)
+    else:
+        engine['neighbours'] = load_or_build_neighbours(tfidf_matrix, data_path, k)
+    if compact:
+        engine['tfidf_matrix'] = load_or_build_compact(tfidf_matrix, data_path, compact, top_m).to_csr()
+    return engine
+
+def answer_query(engine, query):
+    q = normalize_query(query)
+    recs = recommend_movies(
+        title_based=q['title_based'],
+        genre_choice=q['genre_choice'],
+        min_rating=q['min_rating'],
+        mood_label=q['mood_label'],
+        mood_polarity=q['mood_polarity'],
+        top_n=q['top_n'],
+        randomize=bool(q.get('randomize', False)),
+        rating_weight=q['rating_weight'],
+        diversity=q['diversity'],
+        liked=q['liked'],
+        disliked=q['disliked'],
+        **engine
+    )
+    return {'query': q, 'results': recs}
+
+def run_headless(engine, fin, fout):
+    """
+    Answer one JSON query object per input line, writing one JSON line per answer as soon
+    as it is ready. Bad lines get an {"error": ...} record instead of stopping the loop.
+    """
+    for line in fin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            query = json.loads(line)
+            if not isinstance(query, dict):
+                raise ValueError("query must be a JSON object")
+            record = answer_query(engine, query)
+        except QUERY_ERRORS as e:
+            fout.write(json.dumps({'error': str(e), 'line': line}) + '\n')
+            fout.flush()
+            continue
+        write_jsonl([record], fout)
+
+def run_batch(data_path, queries_path, out_path=None, chunksize=None):
+    send_status_to_stderr()
+    movies_df = load_data(data_path, chunksize)
+    tfidf_matrix, _ = load_or_build_tfidf(movies_df, data_path)
+    load_or_build_sentiment(movies_df, data_path)
+    start = time.perf_counter()
+    answered = 0
+    with open(queries_path, encoding='utf-8') as fin:
+        out = open(out_path, 'w', encoding='utf-8') if out_path else sys.stdout
+        try:
+            for record in recommend_batch(movies_df, tfidf_matrix, read_jsonl(fin)):
+                write_jsonl([record], out)
+                answered += 1
+        finally:
+            if out_path:
+                out.close()
+    elapsed = time.perf_counter() - start
+    print(f"Answered {answered} queries in {elapsed:.2f}s ({answered / max(elapsed, 1e-9):.0f} queries/s)",
+          file=sys.stderr)
+
+def build_indexes(data_path, k=NEIGHBOUR_K, chunksize=None):
+    # Offline step: warm every on-disk cache so interactive runs start from a cache read
+    movies_df = load_data(data_path, chunksize)
+    tfidf_matrix, _ = load_or_build_tfidf(movies_df, data_path)
+    load_or_build_neighbours(tfidf_matrix, data_path, k)
+    load_or_build_sentiment(movies_df, data_path)
+
 # ---------------------------
 # Main interactive flow
 # ---------------------------
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        # Records go to stderr or are appended to a file, so stdout stays clean for --batch/--headless
+        enable_profiling(sys.stderr if args.profile == '-' else open(args.profile, 'a', encoding='utf-8'))
+    with profiled('run', argv=sys.argv[1:] if argv is None else list(argv), data=args.data):
+        run(args)
+
+def run(args):
+    if args.build_index:
+        build_indexes(args.data, args.neighbours, args.chunksize)
+        return
+    if args.batch:
+        run_batch(args.data, args.batch, args.out, args.chunksize)
+        return
+    if args.ann_report:
+        movies_df = load_data(args.data, args.chunksize)
+        tfidf_matrix, _ = load_or_build_tfidf(movies_df, args.data)
+        ann_index = load_or_build_ann(tfidf_matrix, args.data, args.embedding or EMBEDDING_DIMS)
+        print_ann_report(ann_report(tfidf_matrix, ann_index))
+        return
+    if args.compact_report:
+        movies_df = load_data(args.data, args.chunksize)
+        tfidf_matrix, _ = load_or_build_tfidf(movies_df, args.data)
+        top_ms = (None, 64, 32, 16) if args.prune is None else (None, args.prune)
+        print_compact_report(compact_report(tfidf_matrix, top_ms=top_ms))
+        return
+    if args.headless:
+        send_status_to_stderr()
+        engine = load_engine(args.data, args.neighbours, args.embedding, args.chunksize, args.cache_size,
+                             args.compact, args.prune)
+        fin = open(args.queries, encoding='utf-8') if args.queries else sys.stdin
+        fout = open(args.out, 'w', encoding='utf-8') if args.out else sys.stdout
+        try:
+            run_headless(engine, fin, fout)
+            if engine['cache'] is not None:
+                status(Fore.CYAN, "Result cache: " + json.dumps(engine['cache'].stats()))
+        finally:
+            if args.queries:
+                fin.close()
+            if args.out:
+                fout.close()
+        return
+
     print(Fore.CYAN + "🎬 Welcome to the Simple Movie Recommender (fixed columns)!")
     print("This demo uses content-based filtering + sentiment analysis.\n")
 
-    movies_df = load_data()  # expects imdb_top_1000.csv with the given columns
-
     processing_animation("Vectorizing movie data")
-    tfidf_matrix, vectorizer = vectorize_text(movies_df)
-
-    # Precompute sentiment for quick filtering
-    movies_df['Polarity'], movies_df['Sentiment'] = zip(*movies_df['Overview'].fillna('').map(lambda t: analyze_sentiment(t)))
+    # Catalog, TF-IDF, sentiment and lookup indexes; expects imdb_top_1000.csv with the given columns
+    engine = load_engine(args.data, args.neighbours, args.embedding, args.chunksize, args.cache_size,
+                         args.compact, args.prune)
+    genre_index = engine['genre_index']
 
     print(Fore.CYAN + "Pick a genre or type 'any' to skip. Some options are:")
-    genres = list_genres(movies_df)
-    print(Fore.GREEN + ", ".join(genres[:20]) + ("..." if len(genres) > 20 else ""))
+    genres = genre_index.top_genres()
+    print(Fore.GREEN + ", ".join(f"{g} ({c})" for g, c in genres[:20]) + ("..." if len(genres) > 20 else ""))
+    print(Fore.CYAN + "Combine genres with ',' (and), '|' (or) and '-' (not), e.g. Comedy|Romance, -Horror")
 
     genre_choice = input(Fore.YELLOW + "Genre (or 'any'): ").strip()
     if genre_choice.lower() in ('any', ''):
@@ -262,9 +2569,16 @@ def main():
     mood_polarity, mood_label = analyze_sentiment(mood_text)
     print(Fore.CYAN + f"Interpreted mood as: {mood_label} (polarity {mood_polarity:.2f})")
 
-    seed = input(Fore.YELLOW + "Type a movie title to find similar movies (or press Enter to skip): ").strip()
-    if seed == "":
-        seed = None
+    print(Fore.CYAN + "Several titles can be separated with ';'; put '-' before one you did not like.")
+    while True:
+        seeds = [t.strip() for t in input(Fore.YELLOW + "Type a movie title to find similar movies "
+                                                        "(or press Enter to skip): ").split(';') if t.strip()]
+        liked = [t for t in seeds if not t.startswith('-')]
+        disliked = [t[1:].strip() for t in seeds if t.startswith('-')]
+        if liked or not disliked:
+            break
+        # Disliked titles only steer a search away; there is nothing to search from without a liked one
+        print(Fore.RED + "Add at least one title you liked (without '-'), or press Enter to skip.")
 
     while True:
         top_n_input = input(Fore.YELLOW + "How many recommendations would you like? (default 5): ").strip()
@@ -284,18 +2598,23 @@ def main():
     processing_animation("Searching for good matches", duration=1.0)
 
     recs = recommend_movies(
-        df=movies_df,
-        tfidf_matrix=tfidf_matrix,
-        title_based=seed,
+        liked=liked,
+        disliked=disliked,
         genre_choice=genre_choice,
         min_rating=min_rating,
-        mood_label=mood_label,
+        mood_polarity=mood_polarity,
         top_n=top_n,
-        randomize=True
+        randomize=True,
+        **engine
     )
 
     display_recommendations(recs)
     print(Fore.CYAN + "Thanks for using the Simple Movie Recommender!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    except ImportError as e:
+        # A required package is missing; the message names it and how to install it
+        print(Fore.RED + f"Error: {e}")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,219 @@
+# activity5_server.py
+#
+# Local HTTP serving mode for activity5_movieRecommender.py with a pre-fork worker pool.
+# The parent loads the catalog and every index once, moves the TF-IDF CSR arrays, numeric
+# columns, genre bits, rating/polarity range indexes and neighbour table (or ANN vectors)
+# into a single multiprocessing.shared_memory block, and then forks the workers. Each worker
+# uses those arrays zero-copy through the inherited mapping, so adding workers does not add
+# copies of the index. Text columns are never written after the fork and stay shared copy-on-write.
+# Needs os.fork (Linux/macOS).
+#
+#   python activity5_server.py --data imdb_top_1000.csv --workers 4 --port 8765
+#   curl 'localhost:8765/recommend?title_based=Inception&top_n=3'
+#   curl -d '{"mood_label": "Positive", "genre_choice": "Comedy"}' localhost:8765/recommend
+#   curl localhost:8765/health
+
+import argparse
+import copy
+import json
+import os
+import signal
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from multiprocessing import shared_memory
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+from scipy import sparse
+
+import activity5_movieRecommender as rec
+
+# ---------------------------
+# Shared-memory arrays
+# ---------------------------
+def share_arrays(arrays, align=64):
+    """
+    Copy a dict of NumPy arrays into one SharedMemory block. Returns (shm, views), where views
+    maps each name to a read-only array backed by the block.
+    """
+    layout, size = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        size = -(-size // align) * align
+        layout[name] = (size, array.dtype, array.shape)
+        size += array.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    views = {}
+    for name, (offset, dtype, shape) in layout.items():
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        view[...] = arrays[name]
+        view.flags.writeable = False
+        views[name] = view
+    return shm, views
+
+def share_engine(engine):
+    """
+    Move the numeric parts of a load_engine() dict into shared memory. Returns (shm, engine)
+    where the new engine references only the shared arrays; the originals can then be freed
+    before forking.
+    """
+    tfidf = sparse.csr_matrix(engine['tfidf_matrix'])
+    catalog = engine['df']
+    arrays = {
+        'tfidf_data': tfidf.data, 'tfidf_indices': tfidf.indices, 'tfidf_indptr': tfidf.indptr,
+        'rating': catalog.rating, 'polarity': catalog.polarity, 'genre_bits': catalog.genre_index.bits,
+        'rating_order': catalog.rating_range.order, 'rating_values': catalog.rating_range.values,
+        'polarity_order': catalog.polarity_range.order, 'polarity_values': catalog.polarity_range.values,
+    }
+    if engine['neighbours'] is not None:
+        arrays['nbr_idx'], arrays['nbr_scores'] = engine['neighbours']
+    if engine['ann_index'] is not None:
+        arrays['ann_vectors'] = engine['ann_index'].vectors
+        arrays['ann_order'] = engine['ann_index'].order
+    shm, views = share_arrays(arrays)
+
+    genre_index = copy.copy(catalog.genre_index)
+    genre_index.bits = views['genre_bits']
+    shared = dict(engine)
+    shared['tfidf_matrix'] = sparse.csr_matrix(
+        (views['tfidf_data'], views['tfidf_indices'], views['tfidf_indptr']), shape=tfidf.shape)
+    shared['df'] = rec.Catalog(catalog.title, catalog.genre, catalog.overview,
+                               views['rating'], views['polarity'], genre_index,
+                               rec.RangeIndex(views['rating'], views['rating_order'], views['rating_values']),
+                               rec.RangeIndex(views['polarity'], views['polarity_order'], views['polarity_values']))
+    shared['genre_index'] = genre_index
+    if engine['neighbours'] is not None:
+        shared['neighbours'] = (views['nbr_idx'], views['nbr_scores'])
+    if engine['ann_index'] is not None:
+        ann = copy.copy(engine['ann_index'])
+        ann.vectors, ann.order = views['ann_vectors'], views['ann_order']
+        shared['ann_index'] = ann
+    return shm, shared
+
+# ---------------------------
+# HTTP handler
+# ---------------------------
+def make_handler(engine):
+    class RecommendHandler(BaseHTTPRequestHandler):
+        # One request per connection, so the kernel spreads connections evenly across workers
+        protocol_version = 'HTTP/1.0'
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/health':
+                stats = engine['cache'].stats() if engine['cache'] is not None else None
+                self.reply(200, {'ok': True, 'pid': os.getpid(), 'titles': len(engine['df']), 'cache': stats})
+            elif url.path == '/recommend':
+                self.recommend(dict(parse_qsl(url.query)))
+            else:
+                self.reply(404, {'error': f"unknown path {url.path}"})
+
+        def do_POST(self):
+            if urlsplit(self.path).path != '/recommend':
+                self.reply(404, {'error': f"unknown path {self.path}"})
+                return
+            try:
+                query = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            except ValueError as e:
+                self.reply(400, {'error': f"invalid JSON: {e}"})
+                return
+            self.recommend(query)
+
+        def recommend(self, query):
+            if not isinstance(query, dict):
+                self.reply(400, {'error': "query must be a JSON object"})
+                return
+            try:
+                record = rec.answer_query(engine, query)
+            except rec.QUERY_ERRORS as e:
+                self.reply(400, {'error': str(e)})
+                return
+            record['results'] = [{k: rec._json_safe(v) for k, v in r.items()} for r in record['results']]
+            self.reply(200, record)
+
+        def reply(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # per-request logging would dominate the cost of a cached query
+
+    return RecommendHandler
+
+# ---------------------------
+# Pre-fork server
+# ---------------------------
+class PreforkHTTPServer(HTTPServer):
+    request_queue_size = 256
+
+def serve(engine, host='127.0.0.1', port=8765, workers=2):
+    """
+    Bind once in the parent, fork `workers` processes that all accept on the same socket,
+    and supervise them until SIGINT/SIGTERM. The shared-memory block is unlinked on exit.
+    Pass the only reference to `engine` so its private arrays are freed once shared.
+    """
+    shm, engine = share_engine(engine)
+    server = PreforkHTTPServer((host, port), make_handler(engine))
+    rec.status(rec.Fore.CYAN, f"Shared index: {shm.size / 1e6:.1f} MB in {shm.name}; "
+                              f"serving http://{host}:{server.server_address[1]} with {workers} workers")
+    children = []
+    try:
+        for _ in range(workers):
+            pid = os.fork()
+            if pid == 0:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                try:
+                    server.serve_forever()
+                finally:
+                    os._exit(0)
+            children.append(pid)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        for pid in children:
+            os.waitpid(pid, 0)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        server.server_close()
+        shm.unlink()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve movie recommendations over HTTP from a pre-fork worker pool.")
+    parser.add_argument('--data', default=rec.DEFAULT_DATA_PATH, help="path to imdb_top_1000.csv")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--neighbours', type=int, default=rec.NEIGHBOUR_K, metavar='K')
+    parser.add_argument('--embedding', type=int, nargs='?', const=rec.EMBEDDING_DIMS, default=None, metavar='DIMS',
+                        help="serve seed queries from an LSA + IVF index instead of the neighbour table")
+    parser.add_argument('--cache-size', type=int, default=rec.RESULT_CACHE_SIZE,
+                        help="per-worker result cache entries (0 disables it)")
+    parser.add_argument('--compact', choices=rec.COMPACT_DTYPES, metavar='{float32,uint8}',
+                        help="serve live queries from a compact TF-IDF index")
+    parser.add_argument('--prune', type=int, metavar='M', help="with --compact, keep each title's M largest weights")
+    parser.add_argument('--profile', metavar='PROFILE.jsonl',
+                        help="append a JSON timing record per request from every worker to this file")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, 'fork'):
+        sys.exit("activity5_server.py needs os.fork (Linux or macOS)")
+    rec.send_status_to_stderr()
+    if args.profile:
+        # Opened in append mode before forking: each worker's records land as whole lines
+        rec.enable_profiling(open(args.profile, 'a', encoding='utf-8'))
+    serve(rec.load_engine(args.data, args.neighbours, args.embedding, cache_size=args.cache_size,
+                          compact=args.compact, top_m=args.prune),
+          args.host, args.port, args.workers)
+
+if __name__ == "__main__":
+    main()